@@ -4,21 +4,164 @@ Author: Shilpaj Bhalerao
 Date: Jul 06, 2021
 """
 # Standard Library Imports
+import gc
+import os
+import asyncio
+import copy
+import sys
+import json
+import mmap
+import struct
+import tracemalloc
+import weakref
+from contextlib import contextmanager, nullcontext, suppress
+from functools import lru_cache
+import platform
 import datetime
+import hashlib
 import random
-from string import ascii_letters
+from heapq import heappush, heappop, heapreplace
+from itertools import chain, combinations, compress, islice
+from math import ceil
+from statistics import median, stdev
+from string import ascii_uppercase
 from time import perf_counter
-from operator import truediv, mul, add
-from collections import namedtuple, Counter
+from operator import truediv, mul, add, itemgetter, attrgetter
+from collections import namedtuple, Counter, OrderedDict
+from collections.abc import Sequence
+from decimal import Decimal
+from concurrent.futures import ProcessPoolExecutor
 from typing import NamedTuple
 
 # Third-Party Imports
-from faker import Faker
+import numpy as np
+from faker import Faker, VERSION as FAKER_VERSION
 
 # Seeding to ensure same data generation for test cases
 fake = Faker()
 Faker.seed(0)
 
+# Blood groups generated by Faker, used as categories for the columnar profile store
+BLOOD_GROUPS = ('A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-')
+
+# Fields of a profile which are used for the calculations
+PROFILE_FIELDS = ('name', 'blood_group', 'current_location', 'birthdate')
+
+# Docstrings of the fields of the profiles generated by Faker
+PROFILE_FIELD_DOCS = {
+    'address': "Address of an individual in String format",
+    'birthdate': "Date of birth of an individual in datetime.date(year, month, day) format",
+    'blood_group': "Blood group of an individual in String format",
+    'company': "Name of a company with which an individual is associated with in String format",
+    'current_location': "Current location of an individual in tuple of Decimals format",
+    'job': "Job of an individual in String format",
+    'mail': "Email address of an individual in String format",
+    'name': "Name of an individual in String format",
+    'residence': "Residence of an individual in String format",
+    'sex': "Gender of an individual in String format",
+    'ssn': "Social Security Number of an individual in String format",
+    'username': "Username of an individual in String format",
+    'website': "Websites of an individual in list of String format",
+}
+
+
+class Instrumentation:
+    """
+    Recorder of the time and memory allocations(traced with tracemalloc) of the phases of the calculations
+    """
+    def __init__(self, trace_memory=True):
+        """
+        Constructor
+        :param trace_memory: True to record the memory allocated in every phase with tracemalloc
+        """
+        self.trace_memory = trace_memory
+        self.records = []
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Context manager to record the time and allocations of a phase
+        :param name: Name of the phase
+        """
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            start_memory = tracemalloc.get_traced_memory()[0]
+        start = perf_counter()
+        try:
+            yield
+        finally:
+            record = {'phase': name, 'seconds': perf_counter() - start}
+            if self.trace_memory:
+                current_memory, peak_memory = tracemalloc.get_traced_memory()
+                record['allocated_bytes'] = current_memory - start_memory
+                record['peak_bytes'] = peak_memory - start_memory
+            self.records.append(record)
+
+    def report(self) -> dict:
+        """
+        Method to get the totals of every phase in the order in which the phases are first recorded
+        :return: dictionary of phase and its number of calls, time and allocations
+        """
+        report = dict()
+        for record in self.records:
+            totals = report.setdefault(record['phase'], {'calls': 0, 'seconds': 0.0, 'allocated_bytes': 0,
+                                                         'peak_bytes': 0})
+            totals['calls'] += 1
+            totals['seconds'] += record['seconds']
+            totals['allocated_bytes'] += record.get('allocated_bytes', 0)
+            totals['peak_bytes'] = max(totals['peak_bytes'], record.get('peak_bytes', 0))
+        return report
+
+    def to_json(self) -> str:
+        """
+        Method to export the report of the phases as JSON
+        :return: JSON string
+        """
+        return json.dumps(self.report(), indent=2)
+
+
+# Active instrumentation, phases are not recorded when it is None
+_instrumentation = None
+_NULL_PHASE = nullcontext()
+
+
+def _phase(name):
+    """
+    Function to get the context manager which records a phase if the instrumentation is enabled
+    :param name: Name of the phase
+    :return: Context manager
+    """
+    if _instrumentation is None:
+        return _NULL_PHASE
+    return _instrumentation.phase(name)
+
+
+@contextmanager
+def instrument(trace_memory=True):
+    """
+    Context manager to enable the instrumentation of the phases of generation, conversion and calculations
+    :param trace_memory: True to record the memory allocated in every phase with tracemalloc
+    :return: Instrumentation with the recorded phases
+    """
+    global _instrumentation
+    previous = _instrumentation
+    started_tracing = trace_memory and not tracemalloc.is_tracing()
+    if started_tracing:
+        tracemalloc.start()
+
+    _instrumentation = Instrumentation(trace_memory=trace_memory)
+    try:
+        yield _instrumentation
+    finally:
+        _instrumentation = previous
+        if started_tracing:
+            tracemalloc.stop()
+
+
+# Verdicts of is_namedtuple_instance for the types already checked, weakly keyed so that dynamically created types
+# can still be garbage collected
+_namedtuple_type_verdicts = weakref.WeakKeyDictionary()
+
 
 def is_namedtuple_instance(instance) -> bool:
     """
@@ -26,8 +169,21 @@ def is_namedtuple_instance(instance) -> bool:
     :param instance: variable to be checked
     :return: True/False
     """
-    # Check type and base classes
     _type = type(instance)
+    verdict = _namedtuple_type_verdicts.get(_type)
+    if verdict is None:
+        verdict = _is_namedtuple_type(_type)
+        _namedtuple_type_verdicts[_type] = verdict
+    return verdict
+
+
+def _is_namedtuple_type(_type) -> bool:
+    """
+    Function to check whether a type is a namedtuple
+    :param _type: type to be checked
+    :return: True/False
+    """
+    # Check base classes
     _bases = _type.__bases__
 
     # Tuple is the parent class of namedtuple so if tuple is not present in bases then return False
@@ -42,6 +198,37 @@ def is_namedtuple_instance(instance) -> bool:
     return all(type(field) == str for field in fields_)
 
 
+def validate_records(records):
+    """
+    Function to check in one pass that all the records are instances of the same namedtuple
+    :param records: list of records to be checked
+    :return: Index of the first record which is not a namedtuple of the type of the first record, None if all the
+    records are valid
+    """
+    if len(records) == 0:
+        raise ValueError("Enter Valid data. Empty list passed to the function")
+
+    if not is_namedtuple_instance(records[0]):
+        return 0
+    record_type = type(records[0])
+    return next((index for index, _type in enumerate(map(type, records)) if _type is not record_type), None)
+
+
+def profile_fields_getter(profile, fields=PROFILE_FIELDS):
+    """
+    Function to get a callable which extracts the fields used for the calculations from a profile
+    :param profile: Sample profile of dictionary or namedtuple type
+    :param fields: Names of the fields to be extracted
+    :return: Callable returning tuple of the fields(name, blood_group, current_location and birthdate by default)
+    """
+    if isinstance(profile, dict):
+        return itemgetter(*fields)
+    elif is_namedtuple_instance(profile):
+        return attrgetter(*fields)
+    raise TypeError(f"Enter correct type of data. Data passed is {type(profile)} and expected "
+                    f"data is dictionary or namedtuple")
+
+
 def generate_profiles(number_of_samples) -> list:
     """
     Function to generate profiles using faker library
@@ -50,63 +237,187 @@ def generate_profiles(number_of_samples) -> list:
     """
     print("Generating Profiles ....")
     profiles = []
-    [profiles.append(fake.profile()) for i in range(number_of_samples)]
+    with _phase('generation'):
+        [profiles.append(fake.profile()) for i in range(number_of_samples)]
+    return profiles
+
+
+def derive_seed(seed, index) -> int:
+    """
+    Function to derive a deterministic seed from a base seed and an index(worker or record number)
+    :param seed: Base seed
+    :param index: Index for which the seed is derived
+    :return: 64-bit integer seed
+    """
+    digest = hashlib.sha256(f"{seed}:{index}".encode()).digest()
+    return int.from_bytes(digest[:8], 'little')
+
+
+def _generate_profile_shard(seed, number_of_samples) -> list:
+    """
+    Function executed by the worker processes to generate a shard of the profiles with its own Faker instance
+    :param seed: Seed of the Faker instance of the worker
+    :param number_of_samples: Number of profiles need to be generated
+    :return: List of dictionaries(generated profiles)
+    """
+    _fake = Faker()
+    _fake.seed_instance(seed)
+    return [_fake.profile() for _ in range(number_of_samples)]
+
+
+def generate_profiles_parallel(number_of_samples, workers=None, seed=0) -> list:
+    """
+    Function to generate profiles using faker library across a pool of processes. Every worker generates a contiguous
+    shard of the profiles with a seed derived from the base seed, so same seed and number of workers always generate
+    the same profiles in the same order
+    :param number_of_samples: Number of profiles need to be generated
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :param seed: Base seed for the generation
+    :return: List of dictionaries(generated profiles)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"Number of workers should be a positive integer but received {workers}")
+
+    # Split the samples as evenly as possible between the workers
+    quotient, remainder = divmod(number_of_samples, workers)
+    shard_sizes = [quotient + 1 if index < remainder else quotient for index in range(workers)]
+    shard_seeds = [derive_seed(seed, index) for index in range(workers)]
+
+    print(f"Generating Profiles on {workers} processes ....")
+    profiles = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # Executor.map returns the shards in the order of the workers
+        for shard in executor.map(_generate_profile_shard, shard_seeds, shard_sizes):
+            profiles.extend(shard)
     return profiles
 
 
-def dictionary_operations(_list_of_dictionaries: list) -> dict:
+class ProfileSequence(Sequence):
+    """
+    Lazy sequence of a virtual population of profiles. Profile i is generated deterministically from (seed, i) only
+    when it is accessed and a bounded number of recently accessed profiles are cached.
+    """
+    def __init__(self, length, seed=0, cache_size=1_024, profile_type=None):
+        """
+        Constructor
+        :param length: Number of profiles in the population
+        :param seed: Base seed from which the seed of every profile is derived
+        :param cache_size: Maximum number of materialized profiles kept in memory
+        :param profile_type: Namedtuple to which the profiles are converted, profiles are dictionaries if None
+        """
+        self.seed = seed
+        self.cache_size = cache_size
+        self.profile_type = profile_type
+        self._indices = range(length)
+        self._cache = OrderedDict()
+        self._fake = Faker()
+
+    def __len__(self):
+        return len(self._indices)
+
+    def __getitem__(self, index):
+        # Slices are views over the same population which share the cache
+        if isinstance(index, slice):
+            view = copy.copy(self)
+            view._indices = self._indices[index]
+            return view
+        return self._profile(self._indices[index])
+
+    def _profile(self, position):
+        """
+        Method to get the profile at a position of the population from the cache or by generating it
+        :param position: Position of the profile in the population
+        :return: Profile of dictionary or namedtuple type
+        """
+        profile = self._cache.get(position)
+        if profile is not None:
+            self._cache.move_to_end(position)
+            return profile
+
+        self._fake.seed_instance(derive_seed(self.seed, position))
+        profile = self._fake.profile()
+        if self.profile_type is not None:
+            profile = self.profile_type._make(itemgetter(*self.profile_type._fields)(profile))
+
+        self._cache[position] = profile
+        if len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+        return profile
+
+
+# Containers of profiles accepted by the profile operations
+PROFILE_LIST_TYPES = (list, ProfileSequence)
+
+
+def iter_profiles(number_of_samples):
+    """
+    Generator to lazily generate profiles using faker library without keeping them in memory
+    :param number_of_samples: Number of profiles need to be generated
+    :return: Generator of dictionaries(generated profiles)
+    """
+    for _ in range(number_of_samples):
+        yield fake.profile()
+
+
+def dictionary_operations(_list_of_dictionaries: list, reference_date=None) -> dict:
     """
     Function to calculate the blood type count, mean_location, oldest person age, and average age of all the profiles
     from the sample profiles.
-    :param _list_of_dictionaries: list of generated profiles which are of dictionary type
+    :param _list_of_dictionaries: list(or ProfileSequence) of generated profiles which are of dictionary type
+    :param reference_date: Date from which the ages are calculated, defaults to today
     :return: dictionary of blood group count, mean location, name and age of oldest person, and average age of all
     the profiles
     """
-    # Lists, dictionaries and variables to collect the profiles' data which is used for calculations
-    _blood_group = []
-    x_location = []
-    y_location = []
-    _days = dict()
-    temp_ = dict()
-    _index = None
+    # Running accumulators updated in a single pass over the profiles
+    _blood_group_count = Counter()
+    x_sum = 0
+    y_sum = 0
+    days_sum = 0
     oldest_days = None
+    temp_ = dict()
 
-    if isinstance(_list_of_dictionaries, list) and len(_list_of_dictionaries) > 0 and isinstance(_list_of_dictionaries[0], dict):
-        for index, profile in enumerate(_list_of_dictionaries):
-            for parameter, data in profile.items():
-                # Update the blood group data
-                if parameter == "blood_group":
-                    _blood_group.append(data)
+    # Reference date is captured once and ages are calculated from day ordinals
+    today = (reference_date or datetime.date.today()).toordinal()
 
-                # Calculate mean current location
-                if parameter == "current_location":
-                    x_location.append(data[0])
-                    y_location.append(data[1])
+    if (isinstance(_list_of_dictionaries, PROFILE_LIST_TYPES) and len(_list_of_dictionaries) > 0
+            and isinstance(_list_of_dictionaries[0], dict)):
+        # Fields are extracted, counted and compared in the same pass so they are recorded as one phase
+        with _phase('dictionary.single_pass'):
+            for profile in _list_of_dictionaries:
+                # Update the blood group data
+                _blood_group_count[profile["blood_group"]] += 1
 
-                # Oldest person age
-                if parameter == "birthdate":
-                    _days[index] = (datetime.date.today() - data).days
-                    oldest_days = max(_days.values())
+                # Accumulate current location for the mean
+                location = profile["current_location"]
+                x_sum += location[0]
+                y_sum += location[1]
 
-        # Find the indexes of all the persons with same oldest age in days
-        _indexes = [key for key, value in _days.items() if value == oldest_days]
-        for _index in _indexes:
-            temp_[_list_of_dictionaries[_index]["name"]] = oldest_days
+                # Age of the person in days
+                days = today - profile["birthdate"].toordinal()
+                days_sum += days
 
-        _blood_group_count = Counter(_blood_group)
+                # Keep track of all the persons with the oldest age seen so far
+                if oldest_days is None or days > oldest_days:
+                    oldest_days = days
+                    temp_ = {profile["name"]: days}
+                elif days == oldest_days:
+                    temp_[profile["name"]] = days
 
-        x_mean = truediv(sum(x_location), len(_list_of_dictionaries))
-        y_mean = truediv(sum(y_location), len(_list_of_dictionaries))
+        with _phase('dictionary.mean'):
+            x_mean = truediv(x_sum, len(_list_of_dictionaries))
+            y_mean = truediv(y_sum, len(_list_of_dictionaries))
 
-        # Average age
-        avg_age = truediv(sum(_days.values()), len(_list_of_dictionaries))
+            # Average age
+            avg_age = truediv(days_sum, len(_list_of_dictionaries))
 
         output = {'blood_count': _blood_group_count,
                   'mean_location': (x_mean, y_mean),
                   'name_age_of_oldest_person': temp_,
                   'average_age_of_profiles': avg_age}
         return output
-    elif type(_list_of_dictionaries) is not list:
+    elif not isinstance(_list_of_dictionaries, PROFILE_LIST_TYPES):
         raise TypeError(f"Expected input data is list but received {type(_list_of_dictionaries)}")
     elif len(_list_of_dictionaries) == 0:
         raise ValueError("Enter Valid data. Empty list passed to the function")
@@ -115,18 +426,13 @@ def dictionary_operations(_list_of_dictionaries: list) -> dict:
                         f"data is dictionary")
 
 
-def namedtuple_operations(list_of_tuples) -> NamedTuple:
+@lru_cache(maxsize=None)
+def create_output_namedtuple():
     """
-    Function to perform operations of namedtuple
-    :param list_of_tuples: list of generated profiles in namedtuple datatype
-    :return: namedtuple of blood_group_count, mean_location, name_of_oldest_person, age and average age of all profiles
+    Function to create the namedtuple used for the output of the profile calculations. The namedtuple is created once
+    and the same type is returned on every call
+    :return: Output namedtuple with docstrings
     """
-    # Variables for calculations
-    _blood_list = []
-    x_data = []
-    y_data = []
-    _days = []
-
     # Define and add docstring to the output namedtuple
     Output = namedtuple('Output', "blood_group_count mean_location name_of_oldest_person age average_age")
     Output.__doc__ = "NamedTuple for the output of the calculations"
@@ -135,32 +441,70 @@ def namedtuple_operations(list_of_tuples) -> NamedTuple:
     Output.name_of_oldest_person.__doc__ = "Name of the oldest individual in the profiles"
     Output.age.__doc__ = "Age of the oldest individual in days"
     Output.average_age.__doc__ = "Average age of all the individuals in the profiles"
+    return Output
+
+
+# Module level name of the namedtuple so that the outputs can be pickled
+Output = create_output_namedtuple()
+
+
+def namedtuple_operations(list_of_tuples, workers=None, reference_date=None) -> NamedTuple:
+    """
+    Function to perform operations of namedtuple
+    :param list_of_tuples: list(or ProfileSequence) of generated profiles in namedtuple datatype
+    :param workers: Number of processes to shard the calculations across, calculations are done serially if None
+    :param reference_date: Date from which the ages are calculated, defaults to today
+    :return: namedtuple of blood_group_count, mean_location, name_of_oldest_person, age and average age of all profiles
+    """
+    if workers is not None and workers < 1:
+        raise ValueError(f"Number of workers should be a positive integer but received {workers}")
 
-    if len(list_of_tuples) > 0 and is_namedtuple_instance(list_of_tuples[0]) and isinstance(list_of_tuples, list):
-        for _tuple in list_of_tuples:
-            # Append data to a list to calculate the blood group count
-            _blood_list.append(_tuple.blood_group)
+    # Output namedtuple with docstrings
+    Output = create_output_namedtuple()
 
-            # Append current location (x, y) to the list for mean calculations
-            x_data.append(_tuple.current_location[0])
-            y_data.append(_tuple.current_location[1])
+    if (len(list_of_tuples) > 0 and is_namedtuple_instance(list_of_tuples[0])
+            and isinstance(list_of_tuples, PROFILE_LIST_TYPES)):
+        if workers is not None and workers > 1:
+            return _namedtuple_operations_parallel(list_of_tuples, workers, reference_date)
 
-            # Oldest Person Age
-            _days.append((datetime.date.today() - _tuple.birthdate).days)
+        # Reference date is captured once and ages are calculated from day ordinals
+        today = (reference_date or datetime.date.today()).toordinal()
+
+        # Extract the fields used for the calculations with C level getters instead of attribute access per row. Lazy
+        # sequences are read once into rows of the required fields so that every profile is generated only once
+        with _phase('namedtuple.field_extraction'):
+            if isinstance(list_of_tuples, list):
+                rows = list_of_tuples
+                getters = [attrgetter(field) for field in PROFILE_FIELDS]
+            else:
+                rows = list(map(attrgetter(*PROFILE_FIELDS), list_of_tuples))
+                getters = [itemgetter(index) for index in range(len(PROFILE_FIELDS))]
+            name_getter, blood_group_getter, location_getter, birthdate_getter = getters
+            _blood_list = list(map(blood_group_getter, rows))
+            _locations = list(map(location_getter, rows))
+            _birthdates = list(map(birthdate_getter, rows))
 
         # Code to calculate the count of blood group
-        _blood_group_count = Counter(_blood_list)
+        with _phase('namedtuple.counter'):
+            _blood_group_count = Counter(_blood_list)
 
         # Calculations for mean location
-        x_mean = truediv(sum(x_data), len(list_of_tuples))
-        y_mean = truediv(sum(y_data), len(list_of_tuples))
+        with _phase('namedtuple.mean'):
+            x_mean, y_mean = mean_location(_locations)
 
-        # Code to check the name of oldest person
-        oldest_days = max(_days)
-        oldest_person_names = [list_of_tuples[index].name for index, _day in enumerate(_days) if _day == oldest_days]
+        # Birthdates as day ordinals, the age in days is the difference from the ordinal of the reference date
+        with _phase('namedtuple.age'):
+            _ordinals = list(map(datetime.date.toordinal, _birthdates))
 
-        # Average age calculations
-        avg_age = truediv(sum(_days), len(list_of_tuples))
+            # Average age calculations
+            avg_age = truediv(today * len(list_of_tuples) - sum(_ordinals), len(list_of_tuples))
+
+        # Code to check the name of oldest person
+        with _phase('namedtuple.oldest_person'):
+            oldest_ordinal = min(_ordinals)
+            oldest_days = today - oldest_ordinal
+            oldest_person_names = [name_getter(rows[index]) for index, _ordinal in enumerate(_ordinals)
+                                   if _ordinal == oldest_ordinal]
 
         # Create an instance of output namedtuple to return the calculated data
         output = Output(blood_group_count=_blood_group_count,
@@ -169,7 +513,7 @@ def namedtuple_operations(list_of_tuples) -> NamedTuple:
                         age=oldest_days,
                         average_age=avg_age)
         return output
-    elif type(list_of_tuples) is not list:
+    elif not isinstance(list_of_tuples, PROFILE_LIST_TYPES):
         raise TypeError(f"Expected input data is list but received {type(list_of_tuples)}")
     elif len(list_of_tuples) == 0:
         raise ValueError("Enter Valid data. Empty list passed to the function")
@@ -178,144 +522,2673 @@ def namedtuple_operations(list_of_tuples) -> NamedTuple:
                         f"data is namedtuple")
 
 
-def compare_namedtuple_and_dictionaries() -> None:
+# Modes of the mean location calculations
+LOCATION_MODES = ('exact', 'fixed', 'fast')
+
+# Locations generated by Faker have at most 7 decimal places, fixed mode stores them as integers of this unit
+FIXED_POINT_DECIMALS = 7
+
+
+def _neumaier_add(total, compensation, value):
+    """
+    Function to add a value to a float sum with Neumaier compensated summation
+    :param total: Running sum
+    :param compensation: Running compensation of the lost low order bits
+    :param value: Value to be added
+    :return: Updated sum and compensation
+    """
+    new_total = total + value
+    if abs(total) >= abs(value):
+        compensation += (total - new_total) + value
+    else:
+        compensation += (value - new_total) + total
+    return new_total, compensation
+
+
+def _mean_coordinate(values, mode, batch_size) -> float:
+    """
+    Function to calculate the mean of one coordinate of the locations in fixed or fast mode, see mean_location
+    :param values: float64 array or list of Decimals of the coordinate
+    :param mode: fixed or fast
+    :param batch_size: Number of values converted and summed together
+    :return: Mean of the coordinate, Decimal for fixed mode and float for fast mode
+    """
+    total, compensation = 0, 0.0
+    for start in range(0, len(values), batch_size):
+        batch = values[start:start + batch_size]
+        if not isinstance(batch, np.ndarray):
+            batch = np.fromiter(map(float, batch), dtype=np.float64, count=len(batch))
+        if mode == 'fixed':
+            total += int(np.rint(batch * 10 ** FIXED_POINT_DECIMALS).astype(np.int64).sum())
+        else:
+            total, compensation = _neumaier_add(total, compensation, float(batch.sum()))
+
+    if mode == 'fixed':
+        return truediv(Decimal(total).scaleb(-FIXED_POINT_DECIMALS), len(values))
+    return truediv(total + compensation, len(values))
+
+
+def mean_location(locations, mode='exact', batch_size=100_000) -> tuple:
+    """
+    Function to calculate the mean of the locations
+    - exact: Decimals are summed in Python, same as the original calculations
+    - fixed: Batches are converted to int64 in units of 10^-FIXED_POINT_DECIMALS degree and summed with NumPy, the
+      sum of the batches is a Python int so it cannot overflow. Same result as exact mode for the Faker locations
+    - fast: Batches are converted to float64 and summed with NumPy, the sums of the batches are added with Neumaier
+      compensated summation. The error is within a few ulp of the mean, around 1e-14 degree
+    Converting Decimals to floats costs more than summing them, fixed and fast mode are faster only when the
+    locations are already stored as float arrays, eg. the columns of ProfileTable and MappedProfileDataset
+    :param locations: list of (x, y) locations or float array of shape (n, 2)
+    :param mode: One of exact, fixed and fast
+    :param batch_size: Number of locations converted and summed together
+    :return: Mean (x, y) location, Decimals for exact and fixed mode and floats for fast mode
+    """
+    if mode not in LOCATION_MODES:
+        raise ValueError(f"Location mode should be one of {LOCATION_MODES} but received {mode}")
+    if len(locations) == 0:
+        raise ValueError("Enter Valid data. Empty list passed to the function")
+
+    count = len(locations)
+    if mode == 'exact':
+        if isinstance(locations, np.ndarray):
+            raise TypeError("Enter correct type of data. Exact mean location requires Decimal locations")
+        return (truediv(sum(map(itemgetter(0), locations)), count),
+                truediv(sum(map(itemgetter(1), locations)), count))
+
+    if isinstance(locations, np.ndarray):
+        columns = (locations[:, 0], locations[:, 1])
+    else:
+        columns = (list(map(itemgetter(0), locations)), list(map(itemgetter(1), locations)))
+    return tuple(_mean_coordinate(column, mode, batch_size) for column in columns)
+
+
+def _repeat_pool(pool, size) -> list:
+    """
+    Function to build a dataset of the required size from a pool of profiles. Faker is slow so a small pool of
+    profiles is repeated to reach the required size
+    :param pool: list of unique profiles
+    :param size: Number of profiles in the dataset
+    :return: list of the profiles of the pool repeated in order
+    """
+    return (pool * (size // len(pool) + 1))[:size]
+
+
+def benchmark_location_modes(number_of_samples=1_000_000, pool_size=1_000, repeat=3, cache=None) -> dict:
+    """
+    Function to compare the time and the error relative to the exact Decimal mean of the location modes
+    :param number_of_samples: Number of locations
+    :param pool_size: Number of unique profiles generated with Faker and repeated to build the dataset
+    :param repeat: Number of timed runs
+    :param cache: DatasetCache from which the pool of profiles is reused, default cache is used if None
+    :return: dictionary of mode and its median time in seconds with the Decimal locations and with the float array,
+    and absolute error of the mean
+    """
+    pool = [profile['current_location'] for profile in cached_generate_profiles(pool_size, cache=cache)]
+    locations = _repeat_pool(pool, number_of_samples)
+    float_locations = np.array(locations, dtype=np.float64)
+    exact = mean_location(locations, mode='exact')
+
+    report = dict()
+    for mode in LOCATION_MODES:
+        result = mean_location(locations, mode=mode)
+        error = max(abs(Decimal(value) - expected) for value, expected in zip(result, exact))
+        report[mode] = {'seconds': benchmark(mean_location, locations, mode=mode, warmup=1, repeat=repeat)['median'],
+                        'array_seconds': None if mode == 'exact' else benchmark(
+                            mean_location, float_locations, mode=mode, warmup=1, repeat=repeat)['median'],
+                        'error': float(error)}
+        array_time = 'n/a' if report[mode]['array_seconds'] is None else f"{report[mode]['array_seconds']:.4f} s"
+        print(f"{mode:>5}: {report[mode]['seconds']:.4f} s | Array: {array_time} | Error: {report[mode]['error']:.3e}")
+    return report
+
+
+def create_person_profile_namedtuple(fields):
+    """
+    Function to create the namedtuple for the profiles with the given fields. The namedtuple is created once for every
+    set of fields and the same type is returned on every call with those fields
+    :param fields: Field names of the profile
+    :return: PersonProfile namedtuple with docstrings
+    """
+    if isinstance(fields, str):
+        fields = fields.replace(',', ' ').split()
+    return _create_person_profile_namedtuple(tuple(fields))
+
+
+def _make_person_profile(fields, values):
+    """
+    Function used to unpickle the PersonProfile namedtuples
+    :param fields: Field names of the profile
+    :param values: Values of the fields
+    :return: PersonProfile namedtuple
+    """
+    return create_person_profile_namedtuple(fields)._make(values)
+
+
+@lru_cache(maxsize=None)
+def _create_person_profile_namedtuple(fields):
+    """
+    Function to create the namedtuple for the profiles with the given fields
+    :param fields: Tuple of field names of the profile
+    :return: PersonProfile namedtuple with docstrings
+    """
+    PersonProfile = namedtuple('PersonProfile', fields)
+    PersonProfile.__doc__ = "Profile of an individual containing data associated with that individual"
+    for field in PersonProfile._fields:
+        if field in PROFILE_FIELD_DOCS:
+            getattr(PersonProfile, field).__doc__ = PROFILE_FIELD_DOCS[field]
+
+    # Dynamic types cannot be found by name while unpickling so the profiles are rebuilt from the cached type
+    PersonProfile.__reduce__ = lambda self: (_make_person_profile, (self._fields, tuple(self)))
+    return PersonProfile
+
+
+def convert_profiles(profiles, profile_type=None, lazy=False):
+    """
+    Function to convert profiles of dictionary type to namedtuples in bulk. The order of the fields is resolved once
+    and the namedtuples are built positionally instead of unpacking keyword arguments for every profile
+    :param profiles: Iterable of generated profiles of dictionary type
+    :param profile_type: Namedtuple to which the profiles are converted, created from the sorted keys of the first
+    profile if None
+    :param lazy: True to return a generator which converts the profiles as they are consumed
+    :return: List(or generator) of namedtuples
+    """
+    iterator = iter(profiles)
+    first = next(iterator, None)
+    if first is None:
+        if profile_type is None:
+            raise ValueError("Enter Valid data. Empty list passed to the function")
+        return iter(()) if lazy else []
+    if not isinstance(first, dict):
+        raise TypeError(f"Enter correct type of data. Data passed is {type(first)} and expected data is dictionary")
+
+    if profile_type is None:
+        profile_type = create_person_profile_namedtuple(sorted(first.keys()))
+
+    # Itemgetter with a single field returns the value instead of a tuple
+    fields = profile_type._fields
+    getter = itemgetter(*fields) if len(fields) > 1 else lambda profile: (profile[fields[0]],)
+
+    converted = map(profile_type._make, map(getter, chain([first], iterator)))
+    if lazy:
+        return converted
+    with _phase('conversion'):
+        return list(converted)
+
+
+def compare_namedtuple_and_dictionaries(workers=None, cache=None, instrumented=False) -> None:
     """
     Function to compare the performance of namedtuples and dictionaries over the 10K profile for same data output
+    :param workers: Number of processes used to generate the profiles when cache is False, serially if None
+    :param cache: DatasetCache from which the profiles are reused, default cache is used if None and profiles are
+    generated every time if False
+    :param instrumented: True to print the time and allocations of every phase of the comparison
     :return: None
     """
-    # Variables used for calculations
-    list_of_named_tuples = []
+    if instrumented:
+        with instrument() as instrumentation:
+            compare_namedtuple_and_dictionaries(workers=workers, cache=cache)
+        print(instrumentation.to_json())
+        return
 
     # Generate 10K profiles
-    list_of_dictionaries = generate_profiles(10_000)
+    if cache is not False:
+        list_of_dictionaries = cached_generate_profiles(10_000, cache=cache)
+    elif workers is None:
+        list_of_dictionaries = generate_profiles(10_000)
+    else:
+        list_of_dictionaries = generate_profiles_parallel(10_000, workers=workers)
 
     # Perform operations on the dictionary
-    start = perf_counter()
     _ = dictionary_operations(list_of_dictionaries)
-    elapsed_dict = perf_counter() - start
+    elapsed_dict = benchmark(dictionary_operations, list_of_dictionaries)['median']
     print("Output: ", _)
-    print("Operation Time on Dictionary: ", elapsed_dict)
+    print("Median Operation Time on Dictionary: ", elapsed_dict)
     print()
 
-    # Sample profile to create named tuple fields
-    sample_profile = list_of_dictionaries[1]
-
-    # Create and add docstring to the namedtuple profile
-    PersonProfile = namedtuple('PersonProfile', sorted(sample_profile.keys()))
-    PersonProfile.__doc__ = "Profile of an individual containing data associated with that individual"
-    PersonProfile.address.__doc__ = "Address of an individual in String format"
-    PersonProfile.birthdate.__doc__ = "Date of birth of an individual in datetime.date(year, month, day) format"
-    PersonProfile.blood_group.__doc__ = "Blood group of an individual in String format"
-    PersonProfile.company.__doc__ = "Name of a company with which an individual is associated with in String format"
-    PersonProfile.current_location.__doc__ = "Current location of an individual in tuple of Decimals format"
-    PersonProfile.job.__doc__ = "Job of an individual in String format"
-    PersonProfile.mail.__doc__ = "Email address of an individual in String format"
-    PersonProfile.name.__doc__ = "Name of an individual in String format"
-    PersonProfile.residence.__doc__ = "Residence of an individual in String format"
-    PersonProfile.sex.__doc__ = "Gender of an individual in String format"
-    PersonProfile.ssn.__doc__ = "Social Security Number of an individual in String format"
-    PersonProfile.username.__doc__ = "Username of an individual in String format"
-    PersonProfile.website.__doc__ = "Websites of an individual in list of String format"
-
-    # Create a list of named tuple
-    [list_of_named_tuples.append(PersonProfile(**profile)) for profile in list_of_dictionaries]
+    # Create the namedtuple profile from the fields of a sample profile and convert all the profiles to it
+    PersonProfile = create_person_profile_namedtuple(sorted(list_of_dictionaries[1].keys()))
+    list_of_named_tuples = convert_profiles(list_of_dictionaries, PersonProfile)
     print(list_of_named_tuples[0])
     print()
 
     # Perform same operations on the namedtuple
-    start = perf_counter()
     _ = namedtuple_operations(list_of_named_tuples)
-    elapsed_named_tuple = perf_counter() - start
+    elapsed_named_tuple = benchmark(namedtuple_operations, list_of_named_tuples)['median']
     print("Output: ", _)
-    print("Operation Time on NamedTuples: ", elapsed_named_tuple)
+    print("Median Operation Time on NamedTuples: ", elapsed_named_tuple)
 
     print()
     print(f"Tuples are faster than dictionaries by {elapsed_dict / elapsed_named_tuple} times")
 
-# ---------------------------------------------------------------------------------------------------------------------
 
+def benchmark_dictionary_operations(sizes=(10_000, 100_000, 1_000_000, 10_000_000), pool_size=1_000, cache=None) -> dict:
+    """
+    Function to show that dictionary_operations scales linearly with the number of profiles
+    :param sizes: Number of profiles for which the operations are timed
+    :param pool_size: Number of unique profiles generated with Faker and repeated to build the larger datasets
+    :param cache: DatasetCache from which the pool of profiles is reused, default cache is used if None
+    :return: dictionary of number of profiles and the time taken in seconds
+    """
+    pool = cached_generate_profiles(pool_size, cache=cache)
+    timings = dict()
 
-def generate_price(share_price, percentage_change, high=False):
+    for size in sizes:
+        list_of_dictionaries = _repeat_pool(pool, size)
+
+        start = perf_counter()
+        dictionary_operations(list_of_dictionaries)
+        elapsed = perf_counter() - start
+        timings[size] = elapsed
+        print(f"Profiles: {size:>12,} | Time: {elapsed:.4f} s | Time per profile: {elapsed / size * 1e6:.3f} us")
+
+    return timings
+
+
+def benchmark_profile_conversion(number_of_samples=1_000_000, pool_size=1_000, repeat=3, cache=None) -> dict:
     """
-    Function to generate prices of the share
-    :param high: True to generate the highest price of the stock
-    :param share_price: Random price of a share
-    :param percentage_change: Maximum percentage change in share price
-    :return: share price
+    Function to compare the throughput of converting dictionaries to namedtuples with keyword unpacking per profile
+    and with the bulk conversion
+    :param number_of_samples: Number of profiles converted
+    :param pool_size: Number of unique profiles generated with Faker and repeated to build the dataset
+    :param repeat: Number of timed runs
+    :param cache: DatasetCache from which the pool of profiles is reused, default cache is used if None
+    :return: dictionary of conversion method and profiles converted per second
     """
-    delta = mul(truediv(percentage_change, 100), share_price)
-    if high:
-        return share_price + delta
-    else:
-        stock_price = random.randint(int(share_price - delta), int(share_price + delta))
-        return stock_price
+    pool = cached_generate_profiles(pool_size, cache=cache)
+    list_of_dictionaries = _repeat_pool(pool, number_of_samples)
+    PersonProfile = create_person_profile_namedtuple(sorted(pool[0].keys()))
 
+    methods = {'keyword_unpacking': lambda: [PersonProfile(**profile) for profile in list_of_dictionaries],
+               'bulk': lambda: convert_profiles(list_of_dictionaries, PersonProfile),
+               'bulk_lazy': lambda: list(convert_profiles(list_of_dictionaries, PersonProfile, lazy=True))}
 
-def generate_stock_data(number_of_companies):
+    throughput = dict()
+    for method, function in methods.items():
+        throughput[method] = truediv(number_of_samples, benchmark(function, warmup=1, repeat=repeat)['median'])
+        print(f"{method:>17}: {throughput[method]:,.0f} profiles per second")
+    return throughput
+
+
+@lru_cache(maxsize=None)
+def create_group_stats_namedtuple():
     """
-    Function to generate stock data for 100 companies
-    :param number_of_companies: number of companies for which data is generated
-    :return: NamedTuple with fields - name, symbol, open, high, close
+    Function to create the namedtuple used for the aggregates of a group of profiles. The namedtuple is created once
+    and the same type is returned on every call
+    :return: GroupStats namedtuple with docstrings
     """
-    _list_of_companies = []
-    market_percentage_fluctuation = 5
-    share_min_price = 100
-    share_max_price = 2000
-    symbol_length = 3
-    _list_of_market_cap = []
-    _list_of_company_symbol = []
+    GroupStats = namedtuple('GroupStats', "count mean_location average_age age")
+    GroupStats.__doc__ = "NamedTuple for the aggregates of the profiles having the same key"
+    GroupStats.count.__doc__ = "Number of individuals in the group"
+    GroupStats.mean_location.__doc__ = "Mean location of the individuals in the group"
+    GroupStats.average_age.__doc__ = "Average age of the individuals in the group in days"
+    GroupStats.age.__doc__ = "Age of the oldest individual in the group in days"
+    return GroupStats
 
-    CompanyStock = namedtuple('CompanyStock', "name symbol open high close market_cap company_weight",
-                              defaults=[None] * 7)
-    CompanyStock.__doc__ = "Stock information for a company"
-    CompanyStock.name.__doc__ = "Name of the company"
-    CompanyStock.symbol.__doc__ = "Symbol of the company"
-    CompanyStock.open.__doc__ = "Opening share price of the company"
-    CompanyStock.high.__doc__ = "Highest share price of the company for the day"
-    CompanyStock.close.__doc__ = "Closing share price of the company"
-    CompanyStock.market_cap.__doc__ = "Market capital of the company"
-    CompanyStock.company_weight.__doc__ = "Weight of the company on stock exchange"
 
-    for i in range(number_of_companies):
-        # Generate company name
-        company_name = fake.company()
+# Module level name of the namedtuple so that the group aggregates can be pickled
+GroupStats = create_group_stats_namedtuple()
 
-        # Generate company symbol
-        company_symbol = company_name[0:symbol_length].upper()
-        company_symbol = company_symbol.replace(' ', random.choice(ascii_letters))
-        company_symbol = company_symbol.replace(',', random.choice(ascii_letters))
-        _list_of_company_symbol.append(company_symbol)
 
-        # Generate a random market_cap for the company
-        company_market_cap = random.randint(1_000_000, 1_000_000_000)
-        _list_of_market_cap.append(company_market_cap)
+class ProfileTable:
+    """
+    Columnar(struct-of-arrays) store of the profiles used for vectorized calculations with NumPy
+    - Birthdates are stored as datetime64[D]
+    - Locations are stored as float64 arrays
+    - Blood groups are stored as int8 codes of the categories in `blood_groups`
+    """
+    def __init__(self, names, birthdates, latitudes, longitudes, blood_codes, blood_groups=BLOOD_GROUPS):
+        """
+        Constructor
+        :param names: Sequence of names of the individuals
+        :param birthdates: Birthdates of the individuals
+        :param latitudes: Latitude of the current location of the individuals
+        :param longitudes: Longitude of the current location of the individuals
+        :param blood_codes: Index of the blood group of the individuals in `blood_groups`
+        :param blood_groups: Categories of the blood groups
+        """
+        self.names = names
+        self.birthdates = np.asarray(birthdates, dtype='datetime64[D]')
+        self.latitudes = np.asarray(latitudes, dtype=np.float64)
+        self.longitudes = np.asarray(longitudes, dtype=np.float64)
+        self.blood_codes = np.asarray(blood_codes, dtype=np.int8)
+        self.blood_groups = tuple(blood_groups)
 
-        # Opening price of company's stock
-        company_open_price = generate_price(random.randint(share_min_price, share_max_price),
-                                            random.randint(0, market_percentage_fluctuation))
+    def __len__(self):
+        return len(self.birthdates)
 
-        # High price of company's stock
-        company_high_price = generate_price(company_open_price, market_percentage_fluctuation, high=True)
+    @classmethod
+    def from_profiles(cls, profiles):
+        """
+        Method to build the table from a list of profiles of dictionary or namedtuple type
+        :param profiles: list of generated profiles in dictionary or namedtuple datatype
+        :return: ProfileTable of the profiles
+        """
+        if len(profiles) == 0:
+            raise ValueError("Enter Valid data. Empty list passed to the function")
 
-        # Closing price of company's stock
-        company_close_price = generate_price(company_open_price, random.randint(0, market_percentage_fluctuation))
+        # Only the fields required for the calculations are stored
+        names, blood_groups, locations, birthdates = zip(*map(profile_fields_getter(profiles[0]), profiles))
 
-        company = CompanyStock(name=company_name, symbol=company_symbol, open=company_open_price,
-                               high=company_high_price, close=company_close_price, market_cap=company_market_cap,
-                               company_weight=None)
+        # Blood groups not present in the default categories are added as new categories
+        categories = {group: code for code, group in enumerate(BLOOD_GROUPS)}
+        blood_codes = [categories.setdefault(group, len(categories)) for group in blood_groups]
+        if len(categories) > np.iinfo(np.int8).max:
+            raise ValueError(f"Too many blood groups to be stored as int8 codes: {len(categories)}")
 
-        # Append the stock data in namedtuple format
-        _list_of_companies.append(company)
+        locations = np.array(locations, dtype=np.float64).reshape(-1, 2)
+        return cls(names=list(names), birthdates=np.array(birthdates, dtype='datetime64[D]'),
+                   latitudes=locations[:, 0], longitudes=locations[:, 1],
+                   blood_codes=np.array(blood_codes, dtype=np.int8), blood_groups=categories.keys())
 
-    _opening_market_value = sum(_list_of_market_cap)
-    _list_of_companies = [company._replace(company_weight=(company.market_cap / _opening_market_value)) for company in _list_of_companies]
+    def operations(self, reference_date=None, location_mode='fast', batch_size=100_000) -> NamedTuple:
+        """
+        Method to calculate the same outputs as namedtuple_operations using vectorized operations
+        :param reference_date: Date from which the ages are calculated, defaults to today
+        :param location_mode: fast for the compensated float mean or fixed for the fixed point Decimal mean of the
+        stored float locations, see mean_location
+        :param batch_size: Number of locations summed together
+        :return: namedtuple of blood_group_count, mean_location, name_of_oldest_person, age and average age of all profiles
+        """
+        if len(self) == 0:
+            raise ValueError("Enter Valid data. Empty table passed to the function")
+        if location_mode not in ('fixed', 'fast'):
+            raise ValueError(f"Location mode of the float columns should be fixed or fast but received {location_mode}")
 
-    return _list_of_companies, _opening_market_value, _list_of_company_symbol
+        Output = create_output_namedtuple()
+
+        # Code to calculate the count of blood group
+        with _phase('columnar.counter'):
+            counts = np.bincount(self.blood_codes, minlength=len(self.blood_groups))
+            _blood_group_count = Counter({self.blood_groups[code]: int(count) for code, count in enumerate(counts)
+                                          if count})
+
+        # Calculations for mean location
+        with _phase('columnar.mean'):
+            x_mean = _mean_coordinate(self.latitudes, location_mode, batch_size)
+            y_mean = _mean_coordinate(self.longitudes, location_mode, batch_size)
+
+        # Age of every individual in days
+        with _phase('columnar.age'):
+            today = np.datetime64(reference_date or datetime.date.today(), 'D').astype(np.int64)
+            _days = today - self.birthdates.view(np.int64)
+
+            # Average age calculations
+            avg_age = truediv(int(_days.sum()), len(self))
+
+        # Code to check the name of oldest person
+        with _phase('columnar.oldest_person'):
+            oldest_days = int(_days[np.argmax(_days)])
+            oldest_person_names = [self.names[index] for index in np.flatnonzero(_days == oldest_days)]
+
+        return Output(blood_group_count=_blood_group_count,
+                      mean_location=(x_mean, y_mean),
+                      name_of_oldest_person=oldest_person_names,
+                      age=oldest_days,
+                      average_age=avg_age)
+
+    def group_by_blood_group(self, reference_date=None) -> dict:
+        """
+        Method to calculate the same aggregates as group_profiles_by(profiles, 'blood_group') using vectorized
+        operations. The mean locations are floats
+        :param reference_date: Date from which the ages are calculated, defaults to today
+        :return: dictionary of blood group and GroupStats namedtuple of the profiles having the blood group
+        """
+        if len(self) == 0:
+            raise ValueError("Enter Valid data. Empty table passed to the function")
+
+        today = np.datetime64(reference_date or datetime.date.today(), 'D').astype(np.int64)
+        _days = today - self.birthdates.view(np.int64)
+
+        # Sums of every group in a single pass over each column
+        size = len(self.blood_groups)
+        counts = np.bincount(self.blood_codes, minlength=size)
+        x_sums = np.bincount(self.blood_codes, weights=self.latitudes, minlength=size)
+        y_sums = np.bincount(self.blood_codes, weights=self.longitudes, minlength=size)
+        days_sums = np.bincount(self.blood_codes, weights=_days, minlength=size)
+        oldest_days = np.full(size, np.iinfo(np.int64).min)
+        np.maximum.at(oldest_days, self.blood_codes, _days)
+
+        GroupStats = create_group_stats_namedtuple()
+        return {self.blood_groups[code]: GroupStats(count=int(counts[code]),
+                                                    mean_location=(float(x_sums[code] / counts[code]),
+                                                                   float(y_sums[code] / counts[code])),
+                                                    average_age=float(days_sums[code] / counts[code]),
+                                                    age=int(oldest_days[code]))
+                for code in np.flatnonzero(counts)}
+
+
+class ProfileAggregator:
+    """
+    Aggregator to calculate the blood group count, mean location, oldest person and average age over chunks of
+    profiles. Only running totals are stored so the memory used does not depend on the number of profiles.
+    """
+    def __init__(self, reference_date=None):
+        """
+        Constructor
+        :param reference_date: Date from which the ages are calculated, defaults to today
+        """
+        self.count = 0
+        self.blood_group_count = Counter()
+        self.x_sum = 0
+        self.y_sum = 0
+        self.days_sum = 0
+        self.oldest_days = None
+        self.oldest_names = []
+        self._today = (reference_date or datetime.date.today()).toordinal()
+
+    def update(self, chunk):
+        """
+        Method to add a chunk of profiles to the aggregates
+        :param chunk: Iterable of profiles of dictionary or namedtuple type
+        :return: self
+        """
+        iterator = iter(chunk)
+        first = next(iterator, None)
+        if first is not None:
+            self._consume(map(profile_fields_getter(first), chain([first], iterator)))
+        return self
+
+    def _consume(self, rows):
+        """
+        Method to add the extracted fields of the profiles to the aggregates
+        :param rows: Iterable of tuples of name, blood_group, current_location and birthdate
+        """
+        for name, blood_group, location, birthdate in rows:
+            self.count += 1
+            self.blood_group_count[blood_group] += 1
+            self.x_sum += location[0]
+            self.y_sum += location[1]
+
+            days = self._today - birthdate.toordinal()
+            self.days_sum += days
+            if self.oldest_days is None or days > self.oldest_days:
+                self.oldest_days = days
+                self.oldest_names = [name]
+            elif days == self.oldest_days:
+                self.oldest_names.append(name)
+
+    def merge(self, other):
+        """
+        Method to combine the aggregates of another aggregator into this one
+        :param other: ProfileAggregator of the profiles which come after the profiles of this aggregator
+        :return: self
+        """
+        self.count += other.count
+        self.blood_group_count.update(other.blood_group_count)
+        self.x_sum += other.x_sum
+        self.y_sum += other.y_sum
+        self.days_sum += other.days_sum
+        if other.oldest_days is not None:
+            if self.oldest_days is None or other.oldest_days > self.oldest_days:
+                self.oldest_days = other.oldest_days
+                self.oldest_names = list(other.oldest_names)
+            elif other.oldest_days == self.oldest_days:
+                self.oldest_names.extend(other.oldest_names)
+        return self
+
+    def result(self) -> NamedTuple:
+        """
+        Method to get the output of the calculations for all the profiles aggregated so far
+        :return: namedtuple of blood_group_count, mean_location, name_of_oldest_person, age and average age of all profiles
+        """
+        if self.count == 0:
+            raise ValueError("Enter Valid data. No profiles are aggregated")
+
+        Output = create_output_namedtuple()
+        return Output(blood_group_count=Counter(self.blood_group_count),
+                      mean_location=(truediv(self.x_sum, self.count), truediv(self.y_sum, self.count)),
+                      name_of_oldest_person=list(self.oldest_names),
+                      age=self.oldest_days,
+                      average_age=truediv(self.days_sum, self.count))
+
+
+def aggregate_profiles(profiles, chunk_size=10_000, reference_date=None) -> NamedTuple:
+    """
+    Function to calculate the profile outputs over any iterable or generator of profiles in fixed size chunks
+    :param profiles: Iterable of profiles of dictionary or namedtuple type
+    :param chunk_size: Number of profiles held in memory at a time
+    :param reference_date: Date from which the ages are calculated, defaults to today
+    :return: namedtuple of blood_group_count, mean_location, name_of_oldest_person, age and average age of all profiles
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size should be a positive integer but received {chunk_size}")
+
+    aggregator = ProfileAggregator(reference_date=reference_date)
+    iterator = iter(profiles)
+    chunk = list(islice(iterator, chunk_size))
+    while chunk:
+        aggregator.update(chunk)
+        chunk = list(islice(iterator, chunk_size))
+    return aggregator.result()
+
+
+def _aggregate_shard(rows, reference_date) -> ProfileAggregator:
+    """
+    Function executed by the worker processes to calculate the partial aggregates of a shard of the profiles
+    :param rows: List of tuples of name, blood_group, current_location and birthdate
+    :param reference_date: Date from which the ages are calculated
+    :return: ProfileAggregator of the shard
+    """
+    aggregator = ProfileAggregator(reference_date=reference_date)
+    aggregator._consume(rows)
+    return aggregator
+
+
+def _namedtuple_operations_parallel(list_of_tuples, workers, reference_date=None) -> NamedTuple:
+    """
+    Function to perform the operations of namedtuple by sharding the profiles across a pool of processes and merging
+    the partial aggregates of the shards in order
+    :param list_of_tuples: list of generated profiles in namedtuple datatype
+    :param workers: Number of worker processes
+    :param reference_date: Date from which the ages are calculated, defaults to today
+    :return: namedtuple of blood_group_count, mean_location, name_of_oldest_person, age and average age of all profiles
+    """
+    # Only the fields used in the calculations are sent to the workers to keep the pickled shards small
+    rows = list(map(attrgetter(*PROFILE_FIELDS), list_of_tuples))
+    shard_size = -(-len(rows) // workers)
+    shards = [rows[start:start + shard_size] for start in range(0, len(rows), shard_size)]
+    reference_date = reference_date or datetime.date.today()
+
+    aggregator = ProfileAggregator(reference_date=reference_date)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(_aggregate_shard, shards, [reference_date] * len(shards)):
+            aggregator.merge(partial)
+    return aggregator.result()
+
+
+class IncrementalProfileStats:
+    """
+    Statistics of a live population of profiles which are updated in O(log n) as profiles are added and removed. Ages
+    are kept in a max-heap of distinct ages with lazy deletion, along with the names of the individuals of every age,
+    so that the oldest individuals can be found without scanning all the profiles.
+    """
+    def __init__(self, profiles=(), reference_date=None):
+        """
+        Constructor
+        :param profiles: Iterable of initial profiles of dictionary or namedtuple type
+        :param reference_date: Date from which the ages are calculated, defaults to today
+        """
+        self.count = 0
+        self.blood_group_count = Counter()
+        self.x_sum = 0
+        self.y_sum = 0
+        self.days_sum = 0
+        self._today = (reference_date or datetime.date.today()).toordinal()
+        self._names_by_days = dict()
+        self._heap = []
+        self._days_in_heap = set()
+
+        for profile in profiles:
+            self.add(profile)
+
+    def __len__(self):
+        return self.count
+
+    def add(self, profile):
+        """
+        Method to add a profile to the statistics
+        :param profile: Profile of dictionary or namedtuple type
+        """
+        name, blood_group, location, birthdate = profile_fields_getter(profile)(profile)
+        days = self._today - birthdate.toordinal()
+
+        self.count += 1
+        self.blood_group_count[blood_group] += 1
+        self.x_sum += location[0]
+        self.y_sum += location[1]
+        self.days_sum += days
+
+        names = self._names_by_days.get(days)
+        if names is None:
+            names = self._names_by_days[days] = Counter()
+            if days not in self._days_in_heap:
+                self._days_in_heap.add(days)
+                heappush(self._heap, -days)
+        names[name] += 1
+
+    def remove(self, profile):
+        """
+        Method to remove a profile which was added to the statistics
+        :param profile: Profile of dictionary or namedtuple type
+        """
+        name, blood_group, location, birthdate = profile_fields_getter(profile)(profile)
+        days = self._today - birthdate.toordinal()
+
+        names = self._names_by_days.get(days)
+        if not names or names[name] == 0 or self.blood_group_count[blood_group] == 0:
+            raise ValueError(f"Profile of {name} is not present in the statistics")
+
+        self.count -= 1
+        self.blood_group_count[blood_group] -= 1
+        if self.blood_group_count[blood_group] == 0:
+            del self.blood_group_count[blood_group]
+        self.x_sum -= location[0]
+        self.y_sum -= location[1]
+        self.days_sum -= days
+
+        # Age is removed from the heap lazily when it reaches the top
+        names[name] -= 1
+        if names[name] == 0:
+            del names[name]
+        if not names:
+            del self._names_by_days[days]
+
+    def _oldest_days(self) -> int:
+        """
+        Method to get the age of the oldest individual after discarding the removed ages from the top of the heap
+        :return: Age in days
+        """
+        while -self._heap[0] not in self._names_by_days:
+            self._days_in_heap.discard(-heappop(self._heap))
+        return -self._heap[0]
+
+    def result(self) -> NamedTuple:
+        """
+        Method to get the output of the calculations for the current profiles
+        :return: namedtuple of blood_group_count, mean_location, name_of_oldest_person, age and average age of all profiles
+        """
+        if self.count == 0:
+            raise ValueError("Enter Valid data. No profiles are present in the statistics")
+
+        Output = create_output_namedtuple()
+        oldest_days = self._oldest_days()
+        return Output(blood_group_count=Counter(self.blood_group_count),
+                      mean_location=(truediv(self.x_sum, self.count), truediv(self.y_sum, self.count)),
+                      name_of_oldest_person=list(self._names_by_days[oldest_days].elements()),
+                      age=oldest_days,
+                      average_age=truediv(self.days_sum, self.count))
+
+
+class ProfileGroupBy:
+    """
+    Hash based group-by which calculates the count, mean location, average age and age of the oldest individual of
+    every key in a single pass. Only one list of running totals is stored per key, so chunks of the profiles can be
+    aggregated separately(eg. in worker processes) and merged
+    """
+    def __init__(self, key, reference_date=None):
+        """
+        Constructor
+        :param key: Name or tuple of names of the fields to group the profiles by, eg. 'blood_group' or
+        ('sex', 'blood_group')
+        :param reference_date: Date from which the ages are calculated, defaults to today
+        """
+        self.key_fields = (key,) if isinstance(key, str) else tuple(key)
+        if len(self.key_fields) == 0:
+            raise ValueError("Enter Valid data. No fields passed to group the profiles by")
+        # Running totals of every key: count, x_sum, y_sum, days_sum and oldest_days
+        self.groups = dict()
+        self._today = (reference_date or datetime.date.today()).toordinal()
+
+    def update(self, chunk):
+        """
+        Method to add a chunk of profiles to the groups
+        :param chunk: Iterable of profiles of dictionary or namedtuple type
+        :return: self
+        """
+        iterator = iter(chunk)
+        first = next(iterator, None)
+        if first is None:
+            return self
+
+        key_getter = profile_fields_getter(first, self.key_fields)
+        location_getter = profile_fields_getter(first, ('current_location', 'birthdate'))
+        groups, today = self.groups, self._today
+        for profile in chain([first], iterator):
+            location, birthdate = location_getter(profile)
+            days = today - birthdate.toordinal()
+            key = key_getter(profile)
+            totals = groups.get(key)
+            if totals is None:
+                groups[key] = [1, location[0], location[1], days, days]
+                continue
+            totals[0] += 1
+            totals[1] += location[0]
+            totals[2] += location[1]
+            totals[3] += days
+            if days > totals[4]:
+                totals[4] = days
+        return self
+
+    def merge(self, other):
+        """
+        Method to combine the groups of another group-by on the same key into this one
+        :param other: ProfileGroupBy of other profiles
+        :return: self
+        """
+        if other.key_fields != self.key_fields:
+            raise ValueError(f"Group-by on {other.key_fields} cannot be merged with group-by on {self.key_fields}")
+
+        for key, other_totals in other.groups.items():
+            totals = self.groups.get(key)
+            if totals is None:
+                self.groups[key] = list(other_totals)
+                continue
+            for index in range(4):
+                totals[index] += other_totals[index]
+            totals[4] = max(totals[4], other_totals[4])
+        return self
+
+    def result(self) -> dict:
+        """
+        Method to get the aggregates of every group
+        :return: dictionary of key and GroupStats namedtuple of the profiles having the key
+        """
+        GroupStats = create_group_stats_namedtuple()
+        return {key: GroupStats(count=count,
+                                mean_location=(truediv(x_sum, count), truediv(y_sum, count)),
+                                average_age=truediv(days_sum, count),
+                                age=oldest_days)
+                for key, (count, x_sum, y_sum, days_sum, oldest_days) in self.groups.items()}
+
+
+def group_profiles_by(profiles, key, chunk_size=10_000, reference_date=None) -> dict:
+    """
+    Function to calculate the count, mean location, average age and age of the oldest individual per key
+    :param profiles: Iterable of profiles of dictionary or namedtuple type
+    :param key: Name or tuple of names of the fields to group the profiles by, eg. 'blood_group', 'sex', 'company'
+    :param chunk_size: Number of profiles held in memory at a time
+    :param reference_date: Date from which the ages are calculated, defaults to today
+    :return: dictionary of key and GroupStats namedtuple of the profiles having the key
+    """
+    if chunk_size < 1:
+        raise ValueError(f"Chunk size should be a positive integer but received {chunk_size}")
+
+    group_by = ProfileGroupBy(key, reference_date=reference_date)
+    iterator = iter(profiles)
+    chunk = list(islice(iterator, chunk_size))
+    if not chunk:
+        raise ValueError("Enter Valid data. Empty list passed to the function")
+    while chunk:
+        group_by.update(chunk)
+        chunk = list(islice(iterator, chunk_size))
+    return group_by.result()
+
+
+class TopKProfiles:
+    """
+    Bounded heap of the k oldest, youngest or closest to a location profiles. Every profile is compared with the
+    k-th best profile at the root of the heap, so k profiles are selected in O(n log k). Profiles tied with the k-th
+    best profile are kept as well, so more than k profiles are returned when there are ties
+    """
+    ORDERS = ('oldest', 'youngest', 'closest')
+
+    def __init__(self, k, order='oldest', location=None):
+        """
+        Constructor
+        :param k: Number of profiles to be selected
+        :param order: One of oldest, youngest and closest
+        :param location: (x, y) location from which the distances are calculated, required for closest order
+        """
+        if k < 1:
+            raise ValueError(f"Number of profiles should be a positive integer but received {k}")
+        if order not in self.ORDERS:
+            raise ValueError(f"Order should be one of {self.ORDERS} but received {order}")
+        if (order == 'closest') != (location is not None):
+            raise ValueError("Location should be passed only for closest order")
+
+        self.k = k
+        self.order = order
+        self.location = None if location is None else (float(location[0]), float(location[1]))
+
+        # Min heap of (score, sequence, profile) with the k-th best profile at the root, sequence keeps the profiles
+        # in the order they were received and avoids comparing the profiles
+        self._heap = []
+        # Profiles with the same score as the root which did not fit in the heap
+        self._ties = []
+        self._sequence = 0
+
+    def _score_getter(self, profile):
+        """
+        Method to get a callable which calculates the score of a profile, larger score is a better profile
+        :param profile: Sample profile of dictionary or namedtuple type
+        :return: Callable returning the score of a profile
+        """
+        if self.order == 'closest':
+            location_getter = profile_fields_getter(profile, ('current_location',))
+            x, y = self.location
+
+            def score(_profile):
+                location = location_getter(_profile)
+                return -((float(location[0]) - x) ** 2 + (float(location[1]) - y) ** 2)
+            return score
+
+        birthdate_getter = profile_fields_getter(profile, ('birthdate',))
+        sign = -1 if self.order == 'oldest' else 1
+        return lambda _profile: sign * birthdate_getter(_profile).toordinal()
+
+    def _push(self, score, profile):
+        """
+        Method to add a profile with its score to the heap
+        :param score: Score of the profile
+        :param profile: Profile of dictionary or namedtuple type
+        """
+        self._sequence += 1
+        item = (score, self._sequence, profile)
+        if len(self._heap) < self.k:
+            heappush(self._heap, item)
+            return
+
+        boundary = self._heap[0][0]
+        if score == boundary:
+            self._ties.append(item)
+        elif score > boundary:
+            removed = heapreplace(self._heap, item)
+            if self._heap[0][0] == removed[0]:
+                self._ties.append(removed)
+            else:
+                # The profiles tied with the previous root are no longer among the k best
+                self._ties = []
+
+    def update(self, chunk):
+        """
+        Method to add a chunk of profiles
+        :param chunk: Iterable of profiles of dictionary or namedtuple type
+        :return: self
+        """
+        iterator = iter(chunk)
+        first = next(iterator, None)
+        if first is not None:
+            score = self._score_getter(first)
+            for profile in chain([first], iterator):
+                self._push(score(profile), profile)
+        return self
+
+    def merge(self, other):
+        """
+        Method to combine the profiles selected by another TopKProfiles into this one
+        :param other: TopKProfiles of the profiles which come after the profiles of this one
+        :return: self
+        """
+        if (other.k, other.order, other.location) != (self.k, self.order, self.location):
+            raise ValueError("TopKProfiles with different k, order or location cannot be merged")
+
+        for score, _, profile in sorted(other._heap + other._ties, key=itemgetter(1)):
+            self._push(score, profile)
+        return self
+
+    def result(self) -> list:
+        """
+        Method to get the selected profiles
+        :return: list of the k best profiles and the profiles tied with the k-th profile, best profile first and
+        tied profiles in the order they were received
+        """
+        items = sorted(self._heap + self._ties, key=itemgetter(1))
+        return [profile for _, _, profile in sorted(items, key=itemgetter(0), reverse=True)]
+
+
+def _top_k_shard(top_k, shard) -> TopKProfiles:
+    """
+    Function executed by the worker processes to select the top k profiles of a shard of the profiles
+    :param top_k: Empty TopKProfiles
+    :param shard: List of profiles of dictionary or namedtuple type
+    :return: TopKProfiles of the shard
+    """
+    return top_k.update(shard)
+
+
+def top_k_profiles(profiles, k, order='oldest', location=None, workers=None) -> list:
+    """
+    Function to select the k oldest, youngest or closest to a location profiles
+    :param profiles: list of profiles of dictionary or namedtuple type, any iterable if workers is None
+    :param k: Number of profiles to be selected
+    :param order: One of oldest, youngest and closest
+    :param location: (x, y) location from which the distances are calculated, required for closest order
+    :param workers: Number of processes to shard the profiles across, profiles are processed serially if None
+    :return: list of the k best profiles and the profiles tied with the k-th profile, best profile first
+    """
+    top_k = TopKProfiles(k, order=order, location=location)
+    if workers is None:
+        return top_k.update(profiles).result()
+    if workers < 1:
+        raise ValueError(f"Number of workers should be a positive integer but received {workers}")
+
+    if len(profiles) == 0:
+        return []
+    shard_size = -(-len(profiles) // workers)
+    shards = [profiles[start:start + shard_size] for start in range(0, len(profiles), shard_size)]
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for partial in executor.map(_top_k_shard, [TopKProfiles(k, order, location)] * len(shards), shards):
+            top_k.merge(partial)
+    return top_k.result()
+
+
+def oldest_profiles(profiles, k=1, workers=None) -> list:
+    """
+    Function to select the k oldest profiles, profiles born on the same day as the k-th oldest are included
+    :param profiles: list of profiles of dictionary or namedtuple type
+    :param k: Number of profiles to be selected
+    :param workers: Number of processes to shard the profiles across, profiles are processed serially if None
+    :return: list of the oldest profiles, oldest first
+    """
+    return top_k_profiles(profiles, k, order='oldest', workers=workers)
+
+
+def youngest_profiles(profiles, k=1, workers=None) -> list:
+    """
+    Function to select the k youngest profiles, profiles born on the same day as the k-th youngest are included
+    :param profiles: list of profiles of dictionary or namedtuple type
+    :param k: Number of profiles to be selected
+    :param workers: Number of processes to shard the profiles across, profiles are processed serially if None
+    :return: list of the youngest profiles, youngest first
+    """
+    return top_k_profiles(profiles, k, order='youngest', workers=workers)
+
+
+def closest_profiles(profiles, location, k=1, workers=None) -> list:
+    """
+    Function to select the k profiles whose current location is closest to a location
+    :param profiles: list of profiles of dictionary or namedtuple type
+    :param location: (x, y) location from which the distances are calculated
+    :param k: Number of profiles to be selected
+    :param workers: Number of processes to shard the profiles across, profiles are processed serially if None
+    :return: list of the closest profiles, closest first
+    """
+    return top_k_profiles(profiles, k, order='closest', location=location, workers=workers)
+
+
+class LocationGrid:
+    """
+    Spatial index which buckets the profiles into square cells of their current location. Radius, bounding box and
+    nearest queries only compute the distances of the profiles in the cells around the queried location. Distances
+    are euclidean in degrees, same as closest_profiles
+    """
+    # Cell (cx, cy) is stored with the key cx * CELL_KEY_STRIDE + cy, unique as long as |cy| < CELL_KEY_STRIDE / 2
+    CELL_KEY_STRIDE = 2 ** 32
+
+    def __init__(self, cell_size=1.0):
+        """
+        Constructor
+        :param cell_size: Width of a cell in degrees
+        """
+        if cell_size <= 0:
+            raise ValueError(f"Cell size should be positive but received {cell_size}")
+        self.cell_size = float(cell_size)
+        self._profiles = []
+        # Coordinates of the profiles, the arrays are grown by doubling so that inserts are amortized O(1)
+        self._x = np.empty(0, dtype=np.float64)
+        self._y = np.empty(0, dtype=np.float64)
+        # Indices of the profiles of every cell, arrays for the bulk built cells and lists for the inserted profiles
+        self._cells = dict()
+        self._inserted = dict()
+        # Range of the occupied cells, the nearest search stops when every occupied cell is searched
+        self._bounds = None
+
+    def __len__(self):
+        return len(self._profiles)
+
+    @classmethod
+    def from_profiles(cls, profiles, cell_size=1.0):
+        """
+        Method to bulk build the index from a list of profiles of dictionary or namedtuple type
+        :param profiles: list of generated profiles in dictionary or namedtuple datatype
+        :param cell_size: Width of a cell in degrees
+        :return: LocationGrid of the profiles
+        """
+        grid = cls(cell_size=cell_size)
+        if len(profiles) == 0:
+            return grid
+
+        locations = np.array(list(map(profile_fields_getter(profiles[0], ('current_location',)), profiles)),
+                             dtype=np.float64).reshape(-1, 2)
+        grid._profiles = list(profiles)
+        grid._x, grid._y = locations[:, 0].copy(), locations[:, 1].copy()
+
+        # Indices sorted by the cell key so that every cell is a slice of the sorted indices
+        cx, cy = grid._cell(grid._x), grid._cell(grid._y)
+        keys = cx * cls.CELL_KEY_STRIDE + cy
+        order = np.argsort(keys, kind='stable')
+        cell_keys, starts = np.unique(keys[order], return_index=True)
+        stops = chain(starts[1:], [len(order)])
+        grid._cells = {int(key): order[start:stop] for key, start, stop in zip(cell_keys, starts, stops)}
+        grid._bounds = [int(cx.min()), int(cx.max()), int(cy.min()), int(cy.max())]
+        return grid
+
+    def _cell(self, value):
+        """
+        Method to get the cell coordinate of a coordinate or an array of coordinates
+        :param value: Coordinate in degrees
+        :return: Cell coordinate
+        """
+        return np.floor_divide(value, self.cell_size).astype(np.int64)
+
+    def insert(self, profile):
+        """
+        Method to add a profile to the index
+        :param profile: Profile of dictionary or namedtuple type
+        :return: Index of the profile
+        """
+        location = profile_fields_getter(profile, ('current_location',))(profile)
+        x, y = float(location[0]), float(location[1])
+        index = len(self._profiles)
+        if index == len(self._x):
+            capacity = max(16, 2 * index)
+            for name in ('_x', '_y'):
+                grown = np.empty(capacity, dtype=np.float64)
+                grown[:index] = getattr(self, name)[:index]
+                setattr(self, name, grown)
+        self._x[index], self._y[index] = x, y
+        self._profiles.append(profile)
+
+        cx, cy = int(self._cell(x)), int(self._cell(y))
+        self._inserted.setdefault(cx * self.CELL_KEY_STRIDE + cy, []).append(index)
+        if self._bounds is None:
+            self._bounds = [cx, cx, cy, cy]
+        else:
+            self._bounds = [min(self._bounds[0], cx), max(self._bounds[1], cx),
+                            min(self._bounds[2], cy), max(self._bounds[3], cy)]
+        return index
+
+    def _indices(self, cells) -> np.ndarray:
+        """
+        Method to get the indices of the profiles in the cells
+        :param cells: Iterable of (cx, cy) cells
+        :return: Array of the indices of the profiles
+        """
+        parts = []
+        for cx, cy in cells:
+            key = cx * self.CELL_KEY_STRIDE + cy
+            if key in self._cells:
+                parts.append(self._cells[key])
+            if key in self._inserted:
+                parts.append(np.array(self._inserted[key], dtype=np.int64))
+        return np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+
+    def _distances(self, indices, x, y) -> np.ndarray:
+        """
+        Method to calculate the squared distances of the profiles from a location
+        :param indices: Array of the indices of the profiles
+        :param x: x coordinate of the location
+        :param y: y coordinate of the location
+        :return: Array of the squared distances
+        """
+        return (self._x[indices] - x) ** 2 + (self._y[indices] - y) ** 2
+
+    def _box_indices(self, min_x, min_y, max_x, max_y) -> np.ndarray:
+        """
+        Method to get the indices of the profiles in the cells covering a box. All the profiles are scanned when the
+        box covers more cells than the occupied cells
+        :param min_x: Smallest x coordinate of the box
+        :param min_y: Smallest y coordinate of the box
+        :param max_x: Largest x coordinate of the box
+        :param max_y: Largest y coordinate of the box
+        :return: Array of the indices of the profiles
+        """
+        return self._cell_range_indices(int(self._cell(min_x)), int(self._cell(min_y)), int(self._cell(max_x)),
+                                        int(self._cell(max_y)))
+
+    def _cell_range_indices(self, min_cx, min_cy, max_cx, max_cy) -> np.ndarray:
+        """
+        Method to get the indices of the profiles in a range of cells. All the profiles are scanned when the range
+        covers more cells than the occupied cells
+        :param min_cx: Smallest x coordinate of the cells
+        :param min_cy: Smallest y coordinate of the cells
+        :param max_cx: Largest x coordinate of the cells
+        :param max_cy: Largest y coordinate of the cells
+        :return: Array of the indices of the profiles
+        """
+        if self._bounds is None:
+            return np.empty(0, dtype=np.int64)
+
+        # Cells outside the range of the occupied cells are empty
+        min_cx, max_cx = max(min_cx, self._bounds[0]), min(max_cx, self._bounds[1])
+        min_cy, max_cy = max(min_cy, self._bounds[2]), min(max_cy, self._bounds[3])
+        if min_cx > max_cx or min_cy > max_cy:
+            return np.empty(0, dtype=np.int64)
+        if (max_cx - min_cx + 1) * (max_cy - min_cy + 1) > len(self._cells) + len(self._inserted):
+            return np.arange(len(self._profiles))
+        return self._indices((cx, cy) for cx in range(min_cx, max_cx + 1) for cy in range(min_cy, max_cy + 1))
+
+    @staticmethod
+    def _ring_cells(cx, cy, ring) -> list:
+        """
+        Method to get the cells on the perimeter of the square of cells around a cell
+        :param cx: x coordinate of the center cell
+        :param cy: y coordinate of the center cell
+        :param ring: Distance of the perimeter from the center cell in cells
+        :return: list of the 8 * ring cells of the perimeter, center cell for ring 0
+        """
+        if ring == 0:
+            return [(cx, cy)]
+        rows = [(cx + dx, cy + dy) for dx in range(-ring, ring + 1) for dy in (-ring, ring)]
+        columns = [(cx + dx, cy + dy) for dx in (-ring, ring) for dy in range(-ring + 1, ring)]
+        return rows + columns
+
+    def within_bbox(self, min_location, max_location) -> list:
+        """
+        Method to get the profiles inside a bounding box
+        :param min_location: (x, y) corner of the box with the smallest coordinates
+        :param max_location: (x, y) corner of the box with the largest coordinates
+        :return: list of the profiles inside the box in the order they were added
+        """
+        min_x, min_y = float(min_location[0]), float(min_location[1])
+        max_x, max_y = float(max_location[0]), float(max_location[1])
+        indices = self._box_indices(min_x, min_y, max_x, max_y)
+        inside = ((self._x[indices] >= min_x) & (self._x[indices] <= max_x) &
+                  (self._y[indices] >= min_y) & (self._y[indices] <= max_y))
+        return [self._profiles[index] for index in np.sort(indices[inside])]
+
+    def within_radius(self, location, radius) -> list:
+        """
+        Method to get the profiles within a radius of a location
+        :param location: (x, y) location
+        :param radius: Radius in degrees
+        :return: list of the profiles within the radius in the order they were added
+        """
+        x, y = float(location[0]), float(location[1])
+        indices = self._box_indices(x - radius, y - radius, x + radius, y + radius)
+        inside = self._distances(indices, x, y) <= radius ** 2
+        return [self._profiles[index] for index in np.sort(indices[inside])]
+
+    def nearest(self, location, k=1) -> list:
+        """
+        Method to get the k profiles nearest to a location. Rings of cells around the location are searched until
+        the k-th nearest profile is closer than the nearest cell which is not searched yet, or until the searched
+        cells are more than the occupied cells and all the profiles are scanned
+        :param location: (x, y) location
+        :param k: Number of profiles
+        :return: list of the nearest profiles, nearest first and profiles at same distance in the order they were added
+        """
+        return self.query_nearest([location], k)[0]
+
+    def _query_groups(self, locations):
+        """
+        Method to group a batch of queried locations by the cell containing them, queries of a cell share the
+        candidate profiles and their distances are calculated together
+        :param locations: list of (x, y) locations or float array of shape (n, 2)
+        :return: float array of the locations and list of the cell and the array of the positions of its queries
+        """
+        locations = np.asarray(locations, dtype=np.float64).reshape(-1, 2)
+        cells = np.column_stack((self._cell(locations[:, 0]), self._cell(locations[:, 1])))
+        group_cells, group_of_query = np.unique(cells, axis=0, return_inverse=True)
+        order = np.argsort(group_of_query.reshape(-1), kind='stable')
+        bounds = np.searchsorted(group_of_query.reshape(-1)[order], np.arange(len(group_cells) + 1))
+        return locations, [((int(cx), int(cy)), order[bounds[group]:bounds[group + 1]])
+                           for group, (cx, cy) in enumerate(group_cells)]
+
+    def _distance_matrix(self, indices, locations) -> np.ndarray:
+        """
+        Method to calculate the squared distances of the profiles from every location
+        :param indices: Array of the indices of the profiles
+        :param locations: float array of shape (n, 2) of the locations
+        :return: (n, number of profiles) array of the squared distances
+        """
+        return ((self._x[indices][np.newaxis, :] - locations[:, :1]) ** 2
+                + (self._y[indices][np.newaxis, :] - locations[:, 1:]) ** 2)
+
+    def query_radius(self, locations, radius) -> list:
+        """
+        Method to run a batch of radius queries. Queries in the same cell share the profiles of the cells within the
+        radius of the cell, and the distances of all of them are calculated in one NumPy operation
+        :param locations: list of (x, y) locations or float array of shape (n, 2)
+        :param radius: Radius in degrees
+        :return: list of the profiles within the radius of every location in the order they were added
+        """
+        locations, groups = self._query_groups(locations)
+        reach = int(np.ceil(radius / self.cell_size))
+        results = [None] * len(locations)
+        for (cx, cy), queries in groups:
+            indices = np.sort(self._cell_range_indices(cx - reach, cy - reach, cx + reach, cy + reach))
+            inside = self._distance_matrix(indices, locations[queries]) <= radius ** 2
+            for query, row in zip(queries, inside):
+                results[query] = [self._profiles[index] for index in indices[row]]
+        return results
+
+    def query_nearest(self, locations, k=1) -> list:
+        """
+        Method to run a batch of nearest queries. Queries in the same cell search the rings around the cell together
+        until the k-th nearest profile of every query is closer than the nearest cell which is not searched yet
+        :param locations: list of (x, y) locations or float array of shape (n, 2)
+        :param k: Number of profiles
+        :return: list of the nearest profiles of every location, nearest first and profiles at same distance in the
+        order they were added
+        """
+        if k < 1:
+            raise ValueError(f"Number of profiles should be a positive integer but received {k}")
+        locations, groups = self._query_groups(locations)
+        if self._bounds is None:
+            return [[] for _ in range(len(locations))]
+
+        min_cx, max_cx, min_cy, max_cy = self._bounds
+        occupied = len(self._cells) + len(self._inserted)
+        results = [None] * len(locations)
+        for (cx, cy), queries in groups:
+            group_locations = locations[queries]
+            last_ring = max(cx - min_cx, max_cx - cx, cy - min_cy, max_cy - cy, 0)
+            parts, distances = [], None
+            for ring in range(last_ring + 1):
+                if (2 * ring + 1) ** 2 > occupied:
+                    # Searching more rings costs more than scanning all the profiles
+                    indices, distances = np.arange(len(self._profiles)), None
+                    break
+                parts.append(self._indices(self._ring_cells(cx, cy, ring)))
+                indices, distances = np.concatenate(parts), None
+                if len(indices) >= k:
+                    distances = self._distance_matrix(indices, group_locations)
+                    # Every profile outside the searched rings is at least ring * cell_size away
+                    if np.all(np.partition(distances, k - 1, axis=1)[:, k - 1] <= (ring * self.cell_size) ** 2):
+                        break
+
+            if distances is None:
+                distances = self._distance_matrix(indices, group_locations)
+            for query, row in zip(queries, distances):
+                order = np.lexsort((indices, row))[:k]
+                results[query] = [self._profiles[index] for index in indices[order]]
+        return results
+
+
+def _linear_within_radius(profiles, location, radius) -> list:
+    """
+    Function to get the profiles within a radius of a location by scanning all the profiles
+    :param profiles: list of profiles in namedtuple datatype
+    :param location: (x, y) location
+    :param radius: Radius in degrees
+    :return: list of the profiles within the radius
+    """
+    x, y = float(location[0]), float(location[1])
+    squared_radius = radius ** 2
+    return [profile for profile in profiles
+            if (float(profile.current_location[0]) - x) ** 2 + (float(profile.current_location[1]) - y) ** 2
+            <= squared_radius]
+
+
+def benchmark_location_grid(number_of_samples=1_000_000, pool_size=1_000, number_of_queries=100, radius=1.0, k=10,
+                            repeat=3, cache=None) -> dict:
+    """
+    Function to compare the radius and nearest queries of the LocationGrid with a linear scan of the profiles
+    :param number_of_samples: Number of profiles
+    :param pool_size: Number of unique profiles generated with Faker and repeated to build the dataset
+    :param number_of_queries: Number of queried locations
+    :param radius: Radius of the radius queries in degrees
+    :param k: Number of profiles of the nearest queries
+    :param repeat: Number of timed runs
+    :param cache: DatasetCache from which the pool of profiles is reused, default cache is used if None
+    :return: dictionary of the median time in seconds of building the index and of a query with the index and with a
+    linear scan
+    """
+    pool = convert_profiles(cached_generate_profiles(pool_size, cache=cache))
+    profiles = _repeat_pool(pool, number_of_samples)
+    rng = np.random.default_rng(0)
+    locations = np.column_stack([rng.uniform(-90, 90, number_of_queries), rng.uniform(-180, 180, number_of_queries)])
+
+    grid = LocationGrid.from_profiles(profiles)
+    # Linear scan is timed on a few of the queries since it takes seconds per query over millions of profiles
+    scanned = locations[:min(number_of_queries, 3)]
+    report = {'build': benchmark(LocationGrid.from_profiles, profiles, warmup=0, repeat=repeat)['median'],
+              'radius': benchmark(grid.query_radius, locations, radius, warmup=1, repeat=repeat)['median']
+              / number_of_queries,
+              'nearest': benchmark(grid.query_nearest, locations, k, warmup=1, repeat=repeat)['median']
+              / number_of_queries,
+              'linear_radius': benchmark(lambda: [_linear_within_radius(profiles, location, radius)
+                                                  for location in scanned], warmup=0, repeat=1)['median']
+              / len(scanned)}
+    print(f"Build: {report['build']:.4f} s | Radius query: {report['radius'] * 1e3:.3f} ms | Nearest query: "
+          f"{report['nearest'] * 1e3:.3f} ms | Linear scan radius query: {report['linear_radius'] * 1e3:.3f} ms")
+    return report
+
+
+class IndexedProfileCollection:
+    """
+    Collection of profiles with hash indexes on chosen fields for O(1) point lookups. Unique indexes map a value to
+    the id of its profile and reject a second profile with the same value, non-unique indexes map a value to the ids
+    of all the profiles having it. Indexes are updated on every insert and delete. Faker repeats usernames and mails,
+    so only ssn is unique by default
+    """
+    def __init__(self, profiles=(), unique=('ssn',), non_unique=('username', 'mail'), skip_violations=False):
+        """
+        Constructor
+        :param profiles: Profiles of dictionary or namedtuple type to be inserted
+        :param unique: Names of the fields with unique indexes
+        :param non_unique: Names of the fields with non-unique indexes
+        :param skip_violations: Skip the profiles violating a unique index instead of raising, see extend
+        """
+        # Profiles by their id, ids are not reused so that deleting a profile does not move the other profiles
+        self._profiles = dict()
+        self._next_id = 0
+        self._unique = {field: dict() for field in unique}
+        self._non_unique = {field: dict() for field in non_unique}
+        # (field, value, profile) of the profiles skipped because of a uniqueness violation
+        self.violations = []
+        self.extend(profiles, skip_violations=skip_violations)
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def __iter__(self):
+        return iter(self._profiles.values())
+
+    def __getitem__(self, profile_id):
+        return self._profiles[profile_id]
+
+    @staticmethod
+    def _field(profile, field):
+        """
+        Method to get the value of a field of a profile
+        :param profile: Profile of dictionary or namedtuple type
+        :param field: Name of the field
+        :return: Value of the field
+        """
+        return profile_fields_getter(profile, (field,))(profile)
+
+    def _accepted(self, profiles, skip_violations):
+        """
+        Method to check which profiles can be inserted without violating the unique indexes. A profile violates an
+        index when its value is already in the collection or in an accepted profile earlier in the batch
+        :param profiles: list of profiles of same type, dictionary or namedtuple
+        :param skip_violations: Record the violating profiles in violations instead of raising ValueError
+        :return: list of True for the profiles which can be inserted and False for the violating profiles
+        """
+        getters = {field: profile_fields_getter(profiles[0], (field,)) for field in self._unique}
+        seen = {field: set() for field in self._unique}
+        accepted = []
+        for position, profile in enumerate(profiles):
+            values = {field: getter(profile) for field, getter in getters.items()}
+            violation = next((field for field, value in values.items()
+                              if value in self._unique[field] or value in seen[field]), None)
+            if violation is None:
+                for field, value in values.items():
+                    seen[field].add(value)
+            elif skip_violations:
+                self.violations.append((violation, values[violation], profile))
+            else:
+                raise ValueError(f"Uniqueness violation on {violation}: {values[violation]!r} of profile {position} is "
+                                 f"already present in the collection")
+            accepted.append(violation is None)
+        return accepted
+
+    def insert(self, profile):
+        """
+        Method to add a profile and update the indexes
+        :param profile: Profile of dictionary or namedtuple type
+        :return: Id of the profile
+        """
+        return self.extend([profile])[0]
+
+    def extend(self, profiles, skip_violations=False):
+        """
+        Method to add profiles and update the indexes. By default no profile is added if any of them violates a unique
+        index, with skip_violations the other profiles are added and the violating ones are recorded in violations
+        :param profiles: Iterable of profiles of same type, dictionary or namedtuple
+        :param skip_violations: Skip the profiles violating a unique index instead of raising ValueError
+        :return: list of the ids of the profiles, None for the skipped profiles
+        """
+        profiles = list(profiles)
+        if not profiles:
+            return []
+        accepted = self._accepted(profiles, skip_violations)
+        inserted = list(compress(profiles, accepted))
+
+        ids = list(range(self._next_id, self._next_id + len(inserted)))
+        self._next_id += len(inserted)
+        self._profiles.update(zip(ids, inserted))
+        for field, index in self._unique.items():
+            index.update(zip(map(profile_fields_getter(profiles[0], (field,)), inserted), ids))
+        for field, index in self._non_unique.items():
+            for value, profile_id in zip(map(profile_fields_getter(profiles[0], (field,)), inserted), ids):
+                index.setdefault(value, set()).add(profile_id)
+
+        new_ids = iter(ids)
+        return [next(new_ids) if is_accepted else None for is_accepted in accepted]
+
+    def delete(self, profile_id):
+        """
+        Method to remove a profile and its entries from the indexes
+        :param profile_id: Id of the profile
+        :return: Removed profile
+        """
+        profile = self._profiles.pop(profile_id)
+        for field, index in self._unique.items():
+            del index[self._field(profile, field)]
+        for field, index in self._non_unique.items():
+            value = self._field(profile, field)
+            index[value].discard(profile_id)
+            if not index[value]:
+                del index[value]
+        return profile
+
+    def add_index(self, field, unique=False):
+        """
+        Method to build a new index over the profiles already in the collection
+        :param field: Name of the field
+        :param unique: True for a unique index
+        """
+        if field in self._unique or field in self._non_unique:
+            raise ValueError(f"Index on {field} already exists")
+
+        index = dict()
+        for profile_id, profile in self._profiles.items():
+            value = self._field(profile, field)
+            if not unique:
+                index.setdefault(value, set()).add(profile_id)
+            elif value in index:
+                raise ValueError(f"Uniqueness violation on {field}: {value!r} is present in profiles {index[value]} "
+                                 f"and {profile_id}")
+            else:
+                index[value] = profile_id
+        (self._unique if unique else self._non_unique)[field] = index
+
+    def get(self, field, value, default=None):
+        """
+        Method to look up a profile with a unique index
+        :param field: Name of the field with a unique index
+        :param value: Value of the field
+        :param default: Value returned when no profile has the value
+        :return: Profile having the value
+        """
+        if field not in self._unique:
+            raise KeyError(f"No unique index on {field}")
+        profile_id = self._unique[field].get(value)
+        return default if profile_id is None else self._profiles[profile_id]
+
+    def find(self, field, value) -> list:
+        """
+        Method to look up the profiles having a value with a unique or non-unique index
+        :param field: Name of the indexed field
+        :param value: Value of the field
+        :return: list of the profiles having the value in the order they were inserted
+        """
+        if field in self._unique:
+            profile_id = self._unique[field].get(value)
+            return [] if profile_id is None else [self._profiles[profile_id]]
+        if field not in self._non_unique:
+            raise KeyError(f"No index on {field}")
+        return [self._profiles[profile_id] for profile_id in sorted(self._non_unique[field].get(value, ()))]
+
+
+class InProcessProfileSource:
+    """
+    Asynchronous source of profiles backed by a bounded asyncio queue, used to feed the profile pipeline locally in
+    place of sockets and message queues. Producers wait on put when the queue is full.
+    """
+    _END = object()
+
+    def __init__(self, maxsize=1_000):
+        """
+        Constructor
+        :param maxsize: Maximum number of profiles waiting in the queue, 0 for unbounded
+        """
+        self._queue = asyncio.Queue(maxsize)
+
+    async def put(self, profile) -> None:
+        """
+        Method to add a profile to the source
+        :param profile: Profile of dictionary or namedtuple type
+        :return: None
+        """
+        await self._queue.put(profile)
+
+    async def close(self) -> None:
+        """
+        Method to mark the end of the profiles
+        :return: None
+        """
+        await self._queue.put(self._END)
+
+    async def feed(self, profiles) -> None:
+        """
+        Method to add all the profiles of an iterable to the source and close it
+        :param profiles: Iterable of profiles of dictionary or namedtuple type
+        :return: None
+        """
+        for profile in profiles:
+            await self.put(profile)
+        await self.close()
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        profile = await self._queue.get()
+        if profile is self._END:
+            raise StopAsyncIteration
+        return profile
+
+
+def _aggregate_batch(prototype, batch):
+    """
+    Function executed by the executor of the profile stream to aggregate a batch into a new partial aggregator
+    :param prototype: Empty aggregator which is copied for the batch
+    :param batch: List of profiles of dictionary or namedtuple type
+    :return: Aggregator of the batch
+    """
+    return copy.deepcopy(prototype).update(batch)
+
+
+async def aggregate_profile_stream(source, batch_size=1_000, max_pending_batches=2, executor=None,
+                                   reference_date=None, aggregator=None):
+    """
+    Asynchronous generator which consumes profiles from an async iterator in batches, aggregates every batch in an
+    executor off the event loop and yields a rolling snapshot of the output after every batch. Reading from the
+    source pauses when max_pending_batches batches are waiting to be aggregated. Every batch is aggregated into a new
+    partial aggregator which is returned by the executor and merged on the event loop, so thread and process executors
+    can both be used.
+    :param source: Async iterator of profiles of dictionary or namedtuple type
+    :param batch_size: Number of profiles aggregated together
+    :param max_pending_batches: Maximum number of batches read ahead of the aggregation
+    :param executor: concurrent.futures executor for the aggregation, default executor of the loop is used if None
+    :param reference_date: Date from which the ages are calculated, defaults to today
+    :param aggregator: Empty aggregator with update, merge and result methods(eg. ProfileGroupBy or TopKProfiles) used
+    in place of the ProfileAggregator, it must be picklable for process executors
+    :return: Async generator of namedtuples of blood_group_count, mean_location, name_of_oldest_person, age and
+    average age(or results of the aggregator) of the profiles received so far
+    """
+    if batch_size < 1 or max_pending_batches < 1:
+        raise ValueError(f"Batch size and pending batches should be positive integers but received {batch_size} and "
+                         f"{max_pending_batches}")
+
+    loop = asyncio.get_running_loop()
+    if aggregator is None:
+        aggregator = ProfileAggregator(reference_date=reference_date)
+    prototype = copy.deepcopy(aggregator)
+    batches = asyncio.Queue(max_pending_batches)
+
+    async def read():
+        batch = []
+        try:
+            async for profile in source:
+                batch.append(profile)
+                if len(batch) == batch_size:
+                    await batches.put(batch)
+                    batch = []
+            if batch:
+                await batches.put(batch)
+        except asyncio.CancelledError:
+            # Consumer has stopped, waiting to put the end of the batches on a full queue would never finish
+            raise
+        except BaseException:
+            await batches.put(None)
+            raise
+        else:
+            await batches.put(None)
+
+    reader = asyncio.ensure_future(read())
+    try:
+        batch = await batches.get()
+        while batch is not None:
+            aggregator.merge(await loop.run_in_executor(executor, _aggregate_batch, prototype, batch))
+            yield aggregator.result()
+            batch = await batches.get()
+
+        # Errors raised while reading the source are raised here
+        await reader
+    finally:
+        reader.cancel()
+        with suppress(asyncio.CancelledError):
+            await reader
+
+
+# Compact profile which stores the location as floats and birthdate as a day ordinal
+CompactProfile = namedtuple('CompactProfile', "address birth_ordinal blood_group company job latitude longitude mail "
+                                              "name residence sex ssn username website")
+CompactProfile.__doc__ = "Compact profile of an individual containing data associated with that individual"
+CompactProfile.address.__doc__ = "Address of an individual in String format"
+CompactProfile.birth_ordinal.__doc__ = "Date of birth of an individual as proleptic Gregorian ordinal in int format"
+CompactProfile.blood_group.__doc__ = "Blood group of an individual in interned String format"
+CompactProfile.company.__doc__ = "Name of a company with which an individual is associated with in String format"
+CompactProfile.job.__doc__ = "Job of an individual in String format"
+CompactProfile.latitude.__doc__ = "Latitude of the current location of an individual in float format"
+CompactProfile.longitude.__doc__ = "Longitude of the current location of an individual in float format"
+CompactProfile.mail.__doc__ = "Email address of an individual in String format"
+CompactProfile.name.__doc__ = "Name of an individual in String format"
+CompactProfile.residence.__doc__ = "Residence of an individual in String format"
+CompactProfile.sex.__doc__ = "Gender of an individual in interned String format"
+CompactProfile.ssn.__doc__ = "Social Security Number of an individual in String format"
+CompactProfile.username.__doc__ = "Username of an individual in String format"
+CompactProfile.website.__doc__ = "Websites of an individual in tuple of String format"
+
+# Properties so that the compact profile can be used in place of the PersonProfile for the calculations
+CompactProfile.current_location = property(lambda self: (self.latitude, self.longitude),
+                                           doc="Current location of an individual in tuple of floats format")
+CompactProfile.birthdate = property(lambda self: datetime.date.fromordinal(self.birth_ordinal),
+                                    doc="Date of birth of an individual in datetime.date(year, month, day) format")
+
+
+def to_compact_profiles(profiles) -> list:
+    """
+    Function to convert the profiles to the compact profile format
+    :param profiles: list of generated profiles in dictionary or namedtuple datatype
+    :return: List of CompactProfile namedtuples
+    """
+    if len(profiles) == 0:
+        raise ValueError("Enter Valid data. Empty list passed to the function")
+
+    fields = ('address', 'birthdate', 'blood_group', 'company', 'job', 'current_location', 'mail', 'name',
+              'residence', 'sex', 'ssn', 'username', 'website')
+    getter = itemgetter(*fields) if isinstance(profiles[0], dict) else attrgetter(*fields)
+
+    compact_profiles = []
+    for (address, birthdate, blood_group, company, job, location, mail, name, residence, sex, ssn, username,
+         website) in map(getter, profiles):
+        compact_profiles.append(CompactProfile(address, birthdate.toordinal(), sys.intern(blood_group), company, job,
+                                               float(location[0]), float(location[1]), mail, name, residence,
+                                               sys.intern(sex), ssn, username, tuple(website)))
+    return compact_profiles
+
+
+def _deep_sizeof(obj, seen) -> int:
+    """
+    Function to calculate the memory used by an object and the objects contained by it
+    :param obj: Object whose size is calculated
+    :param seen: Set of ids of the objects already counted, shared objects are counted only once
+    :return: Size in bytes
+    """
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(_deep_sizeof(key, seen) + _deep_sizeof(value, seen) for key, value in obj.items())
+    elif isinstance(obj, (list, tuple)):
+        size += sum(_deep_sizeof(item, seen) for item in obj)
+    return size
+
+
+def profile_memory_report(list_of_dictionaries) -> dict:
+    """
+    Function to compare the memory used per profile by the dictionary, namedtuple and compact profile formats
+    :param list_of_dictionaries: list of generated profiles which are of dictionary type
+    :return: dictionary of format and bytes used per profile
+    """
+    formats = {'dictionary': list_of_dictionaries,
+               'namedtuple': convert_profiles(list_of_dictionaries),
+               'compact': to_compact_profiles(list_of_dictionaries)}
+
+    report = dict()
+    for name, profiles in formats.items():
+        # Each format is measured independently so that objects shared with the other formats are counted
+        report[name] = truediv(_deep_sizeof(profiles, set()) - sys.getsizeof(profiles), len(profiles))
+        print(f"{name:>10}: {report[name]:.1f} bytes per profile")
+    return report
+
+
+def benchmark(function, *args, warmup=2, repeat=10, **kwargs) -> dict:
+    """
+    Function to time a function with warmup runs and repeated measurements
+    :param function: Function to be timed
+    :param args: Positional arguments of the function
+    :param warmup: Number of runs before the measurements which are not timed
+    :param repeat: Number of timed runs
+    :param kwargs: Keyword arguments of the function
+    :return: dictionary of median, p95, standard deviation, minimum and mean of the timings in seconds
+    """
+    if repeat < 1:
+        raise ValueError(f"Number of repeats should be a positive integer but received {repeat}")
+
+    for _ in range(warmup):
+        function(*args, **kwargs)
+
+    # Garbage collection is disabled during the measurements like timeit to reduce the noise
+    timings = []
+    gc_enabled = gc.isenabled()
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            start = perf_counter()
+            function(*args, **kwargs)
+            timings.append(perf_counter() - start)
+    finally:
+        if gc_enabled:
+            gc.enable()
+
+    timings.sort()
+    return {'median': median(timings),
+            'p95': timings[ceil(0.95 * repeat) - 1],
+            'stddev': stdev(timings) if repeat > 1 else 0.0,
+            'min': timings[0],
+            'mean': truediv(sum(timings), repeat),
+            'repeat': repeat}
+
+
+def run_benchmark_suite(sizes=(1_000, 10_000, 100_000, 1_000_000, 10_000_000),
+                        backends=('dictionary', 'namedtuple', 'columnar', 'parallel'),
+                        pool_size=1_000, warmup=1, repeat=5, workers=None, output_path=None, cache=None) -> dict:
+    """
+    Function to benchmark the profile calculations of all the backends over a range of dataset sizes
+    :param sizes: Number of profiles for which the backends are benchmarked
+    :param backends: Backends to be benchmarked from dictionary, namedtuple, columnar and parallel
+    :param pool_size: Number of unique profiles generated with Faker and repeated to build the larger datasets
+    :param warmup: Number of untimed runs before the measurements
+    :param repeat: Number of timed runs
+    :param workers: Number of processes used by the parallel backend, defaults to the number of CPUs
+    :param output_path: Path of the JSON file in which the results are saved
+    :param cache: DatasetCache from which the pool of profiles is reused, default cache is used if None
+    :return: dictionary of the environment and the timings of every backend and dataset size
+    """
+    unknown_backends = set(backends) - {'dictionary', 'namedtuple', 'columnar', 'parallel'}
+    if unknown_backends:
+        raise ValueError(f"Unknown backends: {sorted(unknown_backends)}")
+
+    pool = cached_generate_profiles(pool_size, cache=cache)
+    pool_of_named_tuples = convert_profiles(pool)
+
+    report = {'created': datetime.datetime.now().isoformat(timespec='seconds'),
+              'python': platform.python_version(),
+              'platform': platform.platform(),
+              'cpu_count': os.cpu_count(),
+              'warmup': warmup,
+              'repeat': repeat,
+              'results': {backend: dict() for backend in backends}}
+
+    for size in sizes:
+        list_of_dictionaries = _repeat_pool(pool, size)
+        list_of_named_tuples = _repeat_pool(pool_of_named_tuples, size)
+
+        # Building the columnar table is not part of the timed calculations
+        functions = {'dictionary': lambda: dictionary_operations(list_of_dictionaries),
+                     'namedtuple': lambda: namedtuple_operations(list_of_named_tuples),
+                     'columnar': ProfileTable.from_profiles(list_of_named_tuples).operations
+                     if 'columnar' in backends else None,
+                     'parallel': lambda: namedtuple_operations(list_of_named_tuples,
+                                                               workers=workers or os.cpu_count())}
+
+        for backend in backends:
+            stats = benchmark(functions[backend], warmup=warmup, repeat=repeat)
+            report['results'][backend][str(size)] = stats
+            print(f"{backend:>10} | Profiles: {size:>12,} | Median: {stats['median']:.4f} s | "
+                  f"P95: {stats['p95']:.4f} s | Stddev: {stats['stddev']:.4f} s")
+
+    if output_path is not None:
+        with open(output_path, 'w') as file:
+            json.dump(report, file, indent=2)
+    return report
+
+
+def compare_benchmark_results(baseline_path, current_path, tolerance=0.1) -> dict:
+    """
+    Function to compare the medians of two saved benchmark results, for example of two commits
+    :param baseline_path: Path of the JSON file of the baseline results
+    :param current_path: Path of the JSON file of the current results
+    :param tolerance: Fractional slowdown of the median above which a result is reported as a regression
+    :return: dictionary of (backend, size) and ratio of current median to baseline median
+    """
+    with open(baseline_path) as file:
+        baseline = json.load(file)['results']
+    with open(current_path) as file:
+        current = json.load(file)['results']
+
+    ratios = dict()
+    for backend, results in current.items():
+        for size, stats in results.items():
+            if size not in baseline.get(backend, {}):
+                continue
+            ratio = truediv(stats['median'], baseline[backend][size]['median'])
+            ratios[(backend, int(size))] = ratio
+            if ratio > 1 + tolerance:
+                print(f"Regression in {backend} for {size} profiles: {ratio:.2f} times slower")
+    return ratios
+
+
+# Magic bytes and fixed size part of the header of the binary profile dataset
+DATASET_MAGIC = b'NTPROF01'
+DATASET_HEADER = struct.Struct('<8sQ')
+
+# Fixed width numeric columns of the binary profile dataset
+DATASET_NUMERIC_COLUMNS = {'birthdate': '<i8', 'latitude': '<f8', 'longitude': '<f8', 'blood_code': '<i1'}
+
+
+def _align(offset, alignment=8) -> int:
+    """
+    Function to round an offset up to a multiple of the alignment
+    :param offset: Offset in bytes
+    :param alignment: Alignment in bytes
+    :return: Aligned offset
+    """
+    return -(-offset // alignment) * alignment
+
+
+def write_profile_dataset(path, profiles) -> None:
+    """
+    Function to write the profiles to a binary columnar file which can be memory-mapped. The file contains a JSON
+    header with the layout of the columns followed by the fixed width numeric columns(birthdate as days since epoch,
+    latitude, longitude and blood group code) and, for every string field, an array of offsets into a UTF-8 heap.
+    :param path: Path of the file
+    :param profiles: list of generated profiles in dictionary or namedtuple datatype
+    :return: None
+    """
+    if len(profiles) == 0:
+        raise ValueError("Enter Valid data. Empty list passed to the function")
+
+    table = ProfileTable.from_profiles(profiles)
+    records = [profile if isinstance(profile, dict) else profile._asdict() for profile in profiles]
+    fields = list(records[0].keys())
+    string_fields = [field for field in fields if field not in ('birthdate', 'current_location', 'blood_group')]
+
+    # Byte strings of every column, websites are stored as one string separated by new lines
+    buffers = {'birthdate': table.birthdates.view(np.int64).astype('<i8').tobytes(),
+               'latitude': table.latitudes.astype('<f8').tobytes(),
+               'longitude': table.longitudes.astype('<f8').tobytes(),
+               'blood_code': table.blood_codes.astype('<i1').tobytes()}
+    for field in string_fields:
+        encoded = [('\n'.join(record[field]) if field == 'website' else record[field]).encode() for record in records]
+        offsets = np.zeros(len(encoded) + 1, dtype='<i8')
+        np.cumsum([len(value) for value in encoded], out=offsets[1:])
+        buffers[f'{field}.offsets'] = offsets.tobytes()
+        buffers[f'{field}.heap'] = b''.join(encoded)
+
+    # Offsets of the columns are relative to the end of the header
+    layout = dict()
+    offset = 0
+    for name, buffer in buffers.items():
+        offset = _align(offset)
+        layout[name] = [offset, len(buffer)]
+        offset += len(buffer)
+
+    header = json.dumps({'count': len(table), 'fields': fields, 'string_fields': string_fields,
+                         'blood_groups': list(table.blood_groups), 'columns': layout}).encode()
+    data_start = _align(DATASET_HEADER.size + len(header))
+
+    with open(path, 'wb') as file:
+        file.write(DATASET_HEADER.pack(DATASET_MAGIC, len(header)))
+        file.write(header)
+        for name, buffer in buffers.items():
+            file.seek(data_start + layout[name][0])
+            file.write(buffer)
+
+
+class StringColumn:
+    """
+    Read-only sequence of strings stored as an array of offsets into a UTF-8 heap of a memory-mapped file
+    """
+    def __init__(self, offsets, heap):
+        """
+        Constructor
+        :param offsets: Array of (number of strings + 1) offsets of the strings in the heap
+        :param heap: Memoryview of the heap
+        """
+        self._offsets = offsets
+        self._heap = heap
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("String column index out of range")
+        return str(self._heap[self._offsets[index]:self._offsets[index + 1]], 'utf-8')
+
+
+class MappedProfileDataset:
+    """
+    Profiles of a binary columnar file written by write_profile_dataset opened with mmap. The columns are NumPy views
+    of the mapped file, so nothing is copied or parsed until a value is accessed.
+    """
+    def __init__(self, path):
+        """
+        Constructor
+        :param path: Path of the file
+        """
+        with open(path, 'rb') as file:
+            # Empty files cannot be mapped and shorter files do not have the header
+            if os.fstat(file.fileno()).st_size < DATASET_HEADER.size:
+                raise ValueError(f"{path} is not a profile dataset")
+            self._mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, header_length = DATASET_HEADER.unpack_from(self._mmap)
+        if magic != DATASET_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a profile dataset")
+
+        # Truncated or invalid headers are reported the same way as a wrong magic, the header is validated before any
+        # view of the mapped file is created so that the mapping can be closed
+        try:
+            header = json.loads(self._mmap[DATASET_HEADER.size:DATASET_HEADER.size + header_length])
+            data_start = _align(DATASET_HEADER.size + header_length)
+            columns = {name: (data_start + offset, data_start + offset + length)
+                       for name, (offset, length) in header['columns'].items()}
+            count = header['count']
+            lengths = {'birthdate': 8 * count, 'latitude': 8 * count, 'longitude': 8 * count, 'blood_code': count}
+            for field in header['string_fields']:
+                lengths[f'{field}.offsets'] = 8 * (count + 1)
+                lengths[f'{field}.heap'] = columns[f'{field}.heap'][1] - columns[f'{field}.heap'][0]
+            if any(columns[name][1] - columns[name][0] != length for name, length in lengths.items()):
+                raise ValueError("Column sizes do not match the number of profiles")
+            if any(start < data_start or stop > len(self._mmap) for start, stop in columns.values()):
+                raise ValueError("Columns are outside the file")
+            self.count = header['count']
+            self.fields = header['fields']
+            self.blood_groups = tuple(header['blood_groups'])
+        except (ValueError, KeyError, TypeError) as error:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a profile dataset") from error
+
+        buffer = memoryview(self._mmap)
+        columns = {name: buffer[start:stop] for name, (start, stop) in columns.items()}
+        self.birthdates = np.frombuffer(columns['birthdate'], dtype='<i8').view('datetime64[D]')
+        self.latitudes = np.frombuffer(columns['latitude'], dtype='<f8')
+        self.longitudes = np.frombuffer(columns['longitude'], dtype='<f8')
+        self.blood_codes = np.frombuffer(columns['blood_code'], dtype='<i1')
+        self.strings = {field: StringColumn(np.frombuffer(columns[f'{field}.offsets'], dtype='<i8'),
+                                            columns[f'{field}.heap'])
+                        for field in header['string_fields']}
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, index) -> dict:
+        return self.profile(index)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def profile(self, index) -> dict:
+        """
+        Method to materialize a profile in the same format as generated by Faker
+        :param index: Index of the profile
+        :return: Profile of dictionary type
+        """
+        if index < 0:
+            index += self.count
+        if not 0 <= index < self.count:
+            raise IndexError("Profile index out of range")
+
+        profile = dict()
+        for field in self.fields:
+            if field == 'birthdate':
+                profile[field] = self.birthdates[index].item()
+            elif field == 'current_location':
+                profile[field] = (Decimal(repr(float(self.latitudes[index]))),
+                                  Decimal(repr(float(self.longitudes[index]))))
+            elif field == 'blood_group':
+                profile[field] = self.blood_groups[self.blood_codes[index]]
+            elif field == 'website':
+                websites = self.strings[field][index]
+                profile[field] = websites.split('\n') if websites else []
+            else:
+                profile[field] = self.strings[field][index]
+        return profile
+
+    def table(self) -> ProfileTable:
+        """
+        Method to get the columnar store of the profiles without copying the mapped columns
+        :return: ProfileTable of the profiles
+        """
+        return ProfileTable(names=self.strings['name'], birthdates=self.birthdates, latitudes=self.latitudes,
+                            longitudes=self.longitudes, blood_codes=self.blood_codes, blood_groups=self.blood_groups)
+
+    def close(self) -> None:
+        """
+        Method to release the views of the mapped file and close it
+        :return: None
+        """
+        self.birthdates = self.latitudes = self.longitudes = self.blood_codes = None
+        self.strings = dict()
+        try:
+            self._mmap.close()
+        except BufferError:
+            # Views of the columns are still referenced outside, the mapping is closed when they are released
+            pass
+
+
+# Directory of the cache of generated datasets, can be changed with SESSION9_CACHE_DIR environment variable
+DATASET_CACHE_DIRECTORY = os.environ.get('SESSION9_CACHE_DIR',
+                                         os.path.join(os.path.expanduser('~'), '.cache', 'session9'))
+
+# Version of the format of the cached datasets, changing it invalidates the cached datasets
+DATASET_CACHE_VERSION = 2
+
+# Types which are not part of JSON are stored as single key objects tagged with these keys
+DATASET_CACHE_DECODERS = {'__tuple__': tuple,
+                          '__date__': datetime.date.fromisoformat,
+                          '__datetime__': datetime.datetime.fromisoformat,
+                          '__decimal__': Decimal}
+
+
+def _encode_cached(value):
+    """
+    Function to convert a dataset to JSON types, tuples, dates and Decimals are tagged so that they are restored on load
+    :param value: Dataset of JSON types, tuples(including namedtuples, which are stored as tuples), dates and Decimals
+    :return: Dataset of JSON types
+    """
+    if isinstance(value, tuple):
+        return {'__tuple__': [_encode_cached(item) for item in value]}
+    if isinstance(value, list):
+        return [_encode_cached(item) for item in value]
+    if isinstance(value, dict):
+        return {key: _encode_cached(item) for key, item in value.items()}
+    if isinstance(value, datetime.datetime):
+        return {'__datetime__': value.isoformat()}
+    if isinstance(value, datetime.date):
+        return {'__date__': value.isoformat()}
+    if isinstance(value, Decimal):
+        return {'__decimal__': str(value)}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _decode_cached(obj):
+    """
+    Function used as object_hook of json.loads to restore the tagged types of a dataset
+    :param obj: Decoded JSON object
+    :return: Restored value or the object itself
+    """
+    if len(obj) == 1:
+        tag, value = next(iter(obj.items()))
+        if tag in DATASET_CACHE_DECODERS:
+            return DATASET_CACHE_DECODERS[tag](value)
+    return obj
+
+
+class DatasetCache:
+    """
+    Content-addressed on-disk cache of generated datasets. Datasets are stored by a hash of the generator, seed,
+    count, provider list and Faker version with a checksum which is validated on load, and the least recently used
+    datasets are removed when the cache grows beyond its size limit.
+    Datasets are stored as JSON, so loading a file from a shared cache directory cannot execute code. The checksum
+    only detects corrupt files, it does not authenticate them: anyone who can write to the directory can change the
+    cached data, so the directory should only be shared between trusted users.
+    """
+    def __init__(self, directory=None, max_bytes=1 << 30):
+        """
+        Constructor
+        :param directory: Directory of the cache, defaults to DATASET_CACHE_DIRECTORY
+        :param max_bytes: Maximum total size of the cached datasets in bytes
+        """
+        self.directory = directory or DATASET_CACHE_DIRECTORY
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(kind, seed, count, providers) -> str:
+        """
+        Method to get the key of a dataset
+        :param kind: Name of the generator of the dataset
+        :param seed: Seed of the generation
+        :param count: Number of records in the dataset
+        :param providers: Faker providers used for the generation
+        :return: Hexadecimal key
+        """
+        description = json.dumps({'kind': kind, 'seed': seed, 'count': count, 'providers': sorted(providers),
+                                  'faker': FAKER_VERSION, 'version': DATASET_CACHE_VERSION}, sort_keys=True)
+        return hashlib.sha256(description.encode()).hexdigest()
+
+    def _path(self, key) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def get(self, key):
+        """
+        Method to load a dataset from the cache
+        :param key: Key of the dataset
+        :return: Dataset or None if it is not cached or the cached file is not valid
+        """
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as file:
+                checksum = file.read(32)
+                payload = file.read()
+        except FileNotFoundError:
+            return None
+
+        # Corrupt or mismatching files are removed so that the dataset is generated again
+        try:
+            if hashlib.sha256(payload).digest() != checksum:
+                raise ValueError(f"Checksum mismatch for {path}")
+            cached = json.loads(payload, object_hook=_decode_cached)
+            if cached['key'] != key:
+                raise ValueError(f"Key mismatch for {path}")
+        except (ValueError, KeyError, TypeError):
+            os.remove(path)
+            return None
+
+        # Access time is tracked with the modification time for the LRU eviction
+        os.utime(path)
+        return cached['data']
+
+    def put(self, key, data) -> None:
+        """
+        Method to store a dataset in the cache and evict the least recently used datasets if the cache is full
+        :param key: Key of the dataset
+        :param data: Dataset of JSON types, tuples, dates and Decimals
+        :return: None
+        """
+        payload = json.dumps({'key': key, 'data': _encode_cached(data)}, separators=(',', ':')).encode()
+        path = self._path(key)
+        temporary_path = f"{path}.{os.getpid()}.tmp"
+        with open(temporary_path, 'wb') as file:
+            file.write(hashlib.sha256(payload).digest())
+            file.write(payload)
+        os.replace(temporary_path, path)
+        self.evict(keep=path)
+
+    def evict(self, keep=None) -> None:
+        """
+        Method to remove the least recently used datasets until the cache is within its size limit
+        :param keep: Path of a dataset which is not removed
+        :return: None
+        """
+        entries = []
+        for name in os.listdir(self.directory):
+            if name.endswith('.json'):
+                stat = os.stat(os.path.join(self.directory, name))
+                entries.append((stat.st_mtime, stat.st_size, os.path.join(self.directory, name)))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if path != keep:
+                os.remove(path)
+                total -= size
+
+    def get_or_generate(self, kind, seed, count, providers, generate):
+        """
+        Method to load a dataset from the cache or generate and store it
+        :param kind: Name of the generator of the dataset
+        :param seed: Seed of the generation
+        :param count: Number of records in the dataset
+        :param providers: Faker providers used for the generation
+        :param generate: Function called without arguments to generate the dataset
+        :return: Dataset
+        """
+        key = self.key(kind, seed, count, providers)
+        data = self.get(key)
+        if data is None:
+            data = generate()
+            self.put(key, data)
+        return data
+
+
+def cached_generate_profiles(number_of_samples, seed=0, cache=None) -> list:
+    """
+    Function to generate profiles with a seeded Faker instance and reuse them from the dataset cache
+    :param number_of_samples: Number of profiles need to be generated
+    :param seed: Seed of the generation
+    :param cache: DatasetCache, default cache is used if None and profiles are generated every time if False
+    :return: List of dictionaries(generated profiles)
+    """
+    if cache is False:
+        return _generate_profile_shard(seed, number_of_samples)
+    cache = cache or DatasetCache()
+    return cache.get_or_generate('profiles', seed, number_of_samples, ['profile'],
+                                 lambda: _generate_profile_shard(seed, number_of_samples))
+
+
+# ---------------------------------------------------------------------------------------------------------------------
+
+
+def generate_price(share_price, percentage_change, high=False):
+    """
+    Function to generate prices of the share
+    :param high: True to generate the highest price of the stock
+    :param share_price: Random price of a share
+    :param percentage_change: Maximum percentage change in share price
+    :return: share price
+    """
+    delta = mul(truediv(percentage_change, 100), share_price)
+    if high:
+        return share_price + delta
+    else:
+        stock_price = random.randint(int(share_price - delta), int(share_price + delta))
+        return stock_price
+
+
+@lru_cache(maxsize=None)
+def create_company_stock_namedtuple():
+    """
+    Function to create the namedtuple used for the stock data of a company. The namedtuple is created once and the
+    same type is returned on every call
+    :return: CompanyStock namedtuple with docstrings
+    """
+    CompanyStock = namedtuple('CompanyStock', "name symbol open high close market_cap company_weight",
+                              defaults=[None] * 7)
+    CompanyStock.__doc__ = "Stock information for a company"
+    CompanyStock.name.__doc__ = "Name of the company"
+    CompanyStock.symbol.__doc__ = "Symbol of the company"
+    CompanyStock.open.__doc__ = "Opening share price of the company"
+    CompanyStock.high.__doc__ = "Highest share price of the company for the day"
+    CompanyStock.close.__doc__ = "Closing share price of the company"
+    CompanyStock.market_cap.__doc__ = "Market capital of the company"
+    CompanyStock.company_weight.__doc__ = "Weight of the company on stock exchange"
+    return CompanyStock
+
+
+# Module level name of the namedtuple so that the stock data can be pickled
+CompanyStock = create_company_stock_namedtuple()
+
+
+class SymbolAllocator:
+    """
+    Allocator of unique company symbols made of uppercase letters. Allocated symbols are tracked in a bitmap over all
+    the possible symbols of the given length, so checking and allocating a symbol is O(1).
+    """
+    # Number of symbols derived from the name which are tried before the next free symbol is taken, so that repeated
+    # names do not walk all the combinations of their letters
+    NAME_CANDIDATES = 4
+    # Letters translated to the digits of a base 26 number, so that int() calculates the position of a symbol
+    BASE_26_DIGITS = str.maketrans(ascii_uppercase, '0123456789abcdefghijklmnop')
+
+    def __init__(self, symbol_length=3):
+        """
+        Constructor
+        :param symbol_length: Number of characters in the symbols
+        """
+        self.symbol_length = symbol_length
+        self.capacity = len(ascii_uppercase) ** symbol_length
+        self.count = 0
+        self._allocated = bytearray(self.capacity)
+
+    def __len__(self):
+        return self.count
+
+    def __contains__(self, symbol):
+        return len(symbol) == self.symbol_length and self._allocated[self._code(symbol)] == 1
+
+    @staticmethod
+    def _code(symbol) -> int:
+        """
+        Method to get the position of a symbol in the bitmap
+        :param symbol: Symbol of uppercase letters
+        :return: Position of the symbol
+        """
+        return int(symbol.translate(SymbolAllocator.BASE_26_DIGITS), 26)
+
+    def _symbol(self, code) -> str:
+        """
+        Method to get the symbol at a position of the bitmap
+        :param code: Position of the symbol
+        :return: Symbol of uppercase letters
+        """
+        letters = []
+        for _ in range(self.symbol_length):
+            code, remainder = divmod(code, 26)
+            letters.append(ascii_uppercase[remainder])
+        return ''.join(reversed(letters))
+
+    def _candidates(self, company_name):
+        """
+        Generator of the preferred symbols for a company, first letters of the name followed by the first letter of
+        the name with the other letters of the name in order
+        :param company_name: Name of the company
+        :return: Generator of symbols
+        """
+        letters = [letter for letter in company_name.upper() if letter in ascii_uppercase]
+        if len(letters) < self.symbol_length:
+            return
+        yield ''.join(letters[:self.symbol_length])
+        for indexes in combinations(range(1, len(letters)), self.symbol_length - 1):
+            yield letters[0] + ''.join(letters[index] for index in indexes)
+
+    def allocate(self, company_name) -> str:
+        """
+        Method to allocate a unique symbol for a company
+        :param company_name: Name of the company
+        :return: Symbol of the company
+        """
+        if self.count == self.capacity:
+            raise ValueError(f"All the {self.capacity} symbols of length {self.symbol_length} are allocated")
+
+        code = None
+        for candidate in islice(self._candidates(company_name), self.NAME_CANDIDATES):
+            candidate_code = self._code(candidate)
+            if code is None:
+                code = candidate_code
+            if not self._allocated[candidate_code]:
+                code = candidate_code
+                break
+        else:
+            # Fall back to the next free symbol after the preferred symbol
+            start = code or 0
+            code = self._allocated.find(0, start)
+            if code == -1:
+                code = self._allocated.find(0, 0, start)
+
+        self._allocated[code] = 1
+        self.count += 1
+        return self._symbol(code)
+
+
+def build_symbol_index(list_of_companies) -> dict:
+    """
+    Function to build an index of the companies by symbol for O(1) lookup
+    :param list_of_companies: List of CompanyStock namedtuples
+    :return: dictionary of symbol and company
+    """
+    index = dict()
+    for company in list_of_companies:
+        if company.symbol in index:
+            raise ValueError(f"Duplicate symbol {company.symbol} for {index[company.symbol].name} and {company.name}")
+        index[company.symbol] = company
+    return index
+
+
+def generate_stock_data(number_of_companies):
+    """
+    Function to generate stock data for 100 companies
+    :param number_of_companies: number of companies for which data is generated
+    :return: NamedTuple with fields - name, symbol, open, high, close
+    """
+    _list_of_companies = []
+    market_percentage_fluctuation = 5
+    share_min_price = 100
+    share_max_price = 2000
+    symbol_allocator = SymbolAllocator(symbol_length=3)
+    _list_of_market_cap = []
+    _list_of_company_symbol = []
+
+    CompanyStock = create_company_stock_namedtuple()
+
+    for i in range(number_of_companies):
+        # Generate company name
+        company_name = fake.company()
+
+        # Generate company symbol
+        company_symbol = symbol_allocator.allocate(company_name)
+        _list_of_company_symbol.append(company_symbol)
+
+        # Generate a random market_cap for the company
+        company_market_cap = random.randint(1_000_000, 1_000_000_000)
+        _list_of_market_cap.append(company_market_cap)
+
+        # Opening price of company's stock
+        company_open_price = generate_price(random.randint(share_min_price, share_max_price),
+                                            random.randint(0, market_percentage_fluctuation))
+
+        # High price of company's stock
+        company_high_price = generate_price(company_open_price, market_percentage_fluctuation, high=True)
+
+        # Closing price of company's stock
+        company_close_price = generate_price(company_open_price, random.randint(0, market_percentage_fluctuation))
+
+        company = CompanyStock(name=company_name, symbol=company_symbol, open=company_open_price,
+                               high=company_high_price, close=company_close_price, market_cap=company_market_cap,
+                               company_weight=None)
+
+        # Append the stock data in namedtuple format
+        _list_of_companies.append(company)
+
+    _opening_market_value = sum(_list_of_market_cap)
+    _list_of_companies = [company._replace(company_weight=(company.market_cap / _opening_market_value)) for company in _list_of_companies]
+
+    return _list_of_companies, _opening_market_value, _list_of_company_symbol
+
+
+class StockMarket:
+    """
+    Stock data of the companies stored in NumPy arrays. Prices, market capitals and weights of all the companies are
+    generated in vectorized batches. Names and symbols of the companies, which are slow to generate with Faker, and
+    the CompanyStock namedtuples are created only when required.
+    """
+    market_percentage_fluctuation = 5
+    share_min_price = 100
+    share_max_price = 2000
+    min_market_cap = 1_000_000
+    max_market_cap = 1_000_000_000
+
+    def __init__(self, open_prices, high_prices, close_prices, market_caps, names=None, symbols=None):
+        """
+        Constructor
+        :param open_prices: Opening share prices of the companies
+        :param high_prices: Highest share prices of the companies for the day
+        :param close_prices: Closing share prices of the companies
+        :param market_caps: Market capitals of the companies
+        :param names: Names of the companies, generated with Faker when accessed if None
+        :param symbols: Symbols of the companies, generated from the names when accessed if None
+        """
+        self._names = None if names is None else list(names)
+        self._symbols = None if symbols is None else list(symbols)
+        self._symbol_index = None
+        self._fake = fake
+        self.open_prices = np.asarray(open_prices, dtype=np.int64)
+        self.high_prices = np.asarray(high_prices, dtype=np.float64)
+        self.close_prices = np.asarray(close_prices, dtype=np.int64)
+        self.market_caps = np.asarray(market_caps, dtype=np.int64)
+
+        # Weights of all the companies are calculated in one normalization step
+        self.opening_market_value = int(self.market_caps.sum())
+        self.weights = self.market_caps / self.opening_market_value
+
+    def __len__(self):
+        return len(self.market_caps)
+
+    @property
+    def names(self) -> list:
+        """
+        Names of the companies
+        """
+        if self._names is None:
+            self._names = [self._fake.company() for _ in range(len(self))]
+        return self._names
+
+    @property
+    def symbols(self) -> list:
+        """
+        Symbols of the companies
+        """
+        if self._symbols is None:
+            # Symbols are made longer than 3 letters when there are more companies than 3 letter symbols
+            symbol_length = 3
+            while len(ascii_uppercase) ** symbol_length < len(self):
+                symbol_length += 1
+            symbol_allocator = SymbolAllocator(symbol_length)
+            self._symbols = [symbol_allocator.allocate(name) for name in self.names]
+        return self._symbols
+
+    @classmethod
+    def generate(cls, number_of_companies, seed=None, batch_size=100_000):
+        """
+        Method to generate the stock data for the companies
+        :param number_of_companies: number of companies for which data is generated
+        :param seed: Seed for the generation, global Faker and NumPy random state are used if None
+        :param batch_size: Number of companies for which prices are generated in one vectorized batch
+        :return: StockMarket of the companies
+        """
+        if number_of_companies < 1:
+            raise ValueError(f"Number of companies should be a positive integer but received {number_of_companies}")
+
+        rng = np.random.default_rng(seed)
+        batches = {'open': [], 'high': [], 'close': [], 'market_cap': []}
+        for start in range(0, number_of_companies, batch_size):
+            size = min(batch_size, number_of_companies - start)
+            fluctuation = cls.market_percentage_fluctuation
+
+            # Generate a random market_cap for the companies
+            batches['market_cap'].append(rng.integers(cls.min_market_cap, cls.max_market_cap, size, endpoint=True))
+
+            # Opening price of companies' stock
+            share_price = rng.integers(cls.share_min_price, cls.share_max_price, size, endpoint=True)
+            delta = rng.integers(0, fluctuation, size, endpoint=True) / 100 * share_price
+            open_prices = rng.integers((share_price - delta).astype(np.int64), (share_price + delta).astype(np.int64),
+                                       endpoint=True)
+            batches['open'].append(open_prices)
+
+            # High price of companies' stock
+            batches['high'].append(open_prices + fluctuation / 100 * open_prices)
+
+            # Closing price of companies' stock
+            delta = rng.integers(0, fluctuation, size, endpoint=True) / 100 * open_prices
+            batches['close'].append(rng.integers((open_prices - delta).astype(np.int64),
+                                                 (open_prices + delta).astype(np.int64), endpoint=True))
+
+        market = cls(open_prices=np.concatenate(batches['open']), high_prices=np.concatenate(batches['high']),
+                     close_prices=np.concatenate(batches['close']), market_caps=np.concatenate(batches['market_cap']))
+
+        # Names are generated from their own seeded generator when they are accessed
+        if seed is not None:
+            market._fake = Faker()
+            market._fake.seed_instance(seed)
+        return market
+
+    def company(self, index):
+        """
+        Method to get the stock data of a company as namedtuple
+        :param index: Index of the company
+        :return: CompanyStock namedtuple
+        """
+        CompanyStock = create_company_stock_namedtuple()
+        return CompanyStock(name=self.names[index], symbol=self.symbols[index], open=int(self.open_prices[index]),
+                            high=float(self.high_prices[index]), close=int(self.close_prices[index]),
+                            market_cap=int(self.market_caps[index]), company_weight=float(self.weights[index]))
+
+    def company_by_symbol(self, symbol):
+        """
+        Method to get the stock data of a company from its symbol using an index built on the first lookup
+        :param symbol: Symbol of the company
+        :return: CompanyStock namedtuple
+        """
+        if self._symbol_index is None:
+            self._symbol_index = {company_symbol: index for index, company_symbol in enumerate(self.symbols)}
+        return self.company(self._symbol_index[symbol])
+
+    def to_namedtuples(self) -> list:
+        """
+        Method to export the stock data of all the companies as namedtuples
+        :return: List of CompanyStock namedtuples
+        """
+        CompanyStock = create_company_stock_namedtuple()
+        columns = zip(self.names, self.symbols, self.open_prices.tolist(), self.high_prices.tolist(),
+                      self.close_prices.tolist(), self.market_caps.tolist(), self.weights.tolist())
+        return list(map(CompanyStock._make, columns))
+
+    def stock_data(self):
+        """
+        Method to export the stock data in the same format as generate_stock_data
+        :return: List of CompanyStock namedtuples, opening market value and list of company symbols
+        """
+        return self.to_namedtuples(), self.opening_market_value, list(self.symbols)
+
+
+def cached_generate_stock_data(number_of_companies, seed=0, cache=None):
+    """
+    Function to generate stock data with a seeded StockMarket and reuse it from the dataset cache
+    :param number_of_companies: number of companies for which data is generated
+    :param seed: Seed of the generation
+    :param cache: DatasetCache, default cache is used if None and stock data is generated every time if False
+    :return: List of CompanyStock namedtuples, opening market value and list of company symbols
+    """
+    def generate():
+        market = StockMarket.generate(number_of_companies, seed=seed)
+        # Companies are cached as plain tuples so the cached files do not depend on the CompanyStock definition
+        return [tuple(company) for company in market.to_namedtuples()], market.opening_market_value, market.symbols
+
+    if cache is False:
+        return StockMarket.generate(number_of_companies, seed=seed).stock_data()
+    cache = cache or DatasetCache()
+    rows, opening_market_value, symbols = cache.get_or_generate('stock_data', seed, number_of_companies,
+                                                                ['company', 'numpy'], generate)
+    CompanyStock = create_company_stock_namedtuple()
+    return list(map(CompanyStock._make, rows)), opening_market_value, symbols
+
+
+@lru_cache(maxsize=None)
+def create_market_simulation_namedtuple():
+    """
+    Function to create the namedtuple used for the output of the market simulation. The namedtuple is created once
+    and the same type is returned on every call
+    :return: MarketSimulation namedtuple with docstrings
+    """
+    MarketSimulation = namedtuple('MarketSimulation', "share_prices market_caps points")
+    MarketSimulation.__doc__ = "Output of the simulation of the market over a number of steps"
+    MarketSimulation.share_prices.__doc__ = "Share prices of the companies at every step in (steps + 1, companies) array"
+    MarketSimulation.market_caps.__doc__ = "Market capitals of the companies at every step in (steps + 1, companies) array"
+    MarketSimulation.points.__doc__ = "Points of the market index at every step in (steps + 1,) array"
+    return MarketSimulation
+
+
+# Module level name of the namedtuple so that the simulations can be pickled
+MarketSimulation = create_market_simulation_namedtuple()
+
+
+def _simulate_growth(rng, steps, number_of_companies, max_percentage_change, dtype):
+    """
+    Function to generate the cumulative growth of the companies for every step of the simulation
+    :param rng: NumPy random number generator
+    :param steps: Number of trading days(or ticks) to simulate
+    :param number_of_companies: Number of companies in the market
+    :param max_percentage_change: Maximum percentage change of a company in one step
+    :param dtype: Data type of the output array
+    :return: (steps + 1, companies) array of growth of the companies with respect to the opening
+    """
+    growth = np.empty((steps + 1, number_of_companies), dtype=dtype)
+    growth[0] = 1
+    changes = rng.integers(-max_percentage_change, max_percentage_change, (steps, number_of_companies), endpoint=True)
+    np.cumprod(1 + changes / 100, axis=0, out=growth[1:])
+    return growth
+
+
+def simulate_market(market, steps, seed=None, max_percentage_change=10, dtype=np.float64) -> NamedTuple:
+    """
+    Function to simulate the market over a number of trading days(or ticks). At every step each company moves by a
+    random percentage like in stock_market_ and the moves are compounded over the steps.
+    :param market: StockMarket of the companies
+    :param steps: Number of trading days(or ticks) to simulate
+    :param seed: Seed for the simulation
+    :param max_percentage_change: Maximum percentage change of a company in one step
+    :param dtype: Data type of the price and market capital arrays, np.float32 halves the memory
+    :return: namedtuple of share prices, market capitals and index points at every step
+    """
+    if steps < 1:
+        raise ValueError(f"Number of steps should be a positive integer but received {steps}")
+
+    MarketSimulation = create_market_simulation_namedtuple()
+    growth = _simulate_growth(np.random.default_rng(seed), steps, len(market), max_percentage_change, dtype)
+    market_caps = growth * market.market_caps.astype(dtype)
+    share_prices = growth * market.close_prices.astype(dtype)
+    points = 100 * market_caps.sum(axis=1, dtype=np.float64) / market.opening_market_value
+    return MarketSimulation(share_prices=share_prices, market_caps=market_caps, points=points)
+
+
+def _simulate_points_paths(market_caps, steps, number_of_paths, seed_sequence, max_percentage_change) -> np.ndarray:
+    """
+    Function executed by the worker processes to simulate a chunk of the Monte Carlo paths of the market index
+    :param market_caps: Market capitals of the companies at the opening
+    :param steps: Number of trading days(or ticks) to simulate
+    :param number_of_paths: Number of paths to simulate
+    :param seed_sequence: NumPy SeedSequence of the chunk
+    :param max_percentage_change: Maximum percentage change of a company in one step
+    :return: (paths, steps + 1) array of the index points
+    """
+    rng = np.random.default_rng(seed_sequence)
+    opening_market_value = market_caps.sum()
+    points = np.empty((number_of_paths, steps + 1), dtype=np.float64)
+
+    # Each path is simulated with vectorized operations over all the steps and companies
+    for path in range(number_of_paths):
+        growth = _simulate_growth(rng, steps, len(market_caps), max_percentage_change, np.float64)
+        points[path] = 100 * (growth @ market_caps) / opening_market_value
+    return points
+
+
+def monte_carlo_market_points(market, steps, paths, workers=None, seed=0, max_percentage_change=10) -> np.ndarray:
+    """
+    Function to simulate Monte Carlo paths of the market index across a pool of processes. The paths are split in
+    chunks between the workers and each chunk gets its own seed spawned from the base seed, so same seed and number
+    of workers always generate the same paths
+    :param market: StockMarket of the companies
+    :param steps: Number of trading days(or ticks) to simulate
+    :param paths: Number of Monte Carlo paths
+    :param workers: Number of worker processes, defaults to the number of CPUs
+    :param seed: Base seed for the simulation
+    :param max_percentage_change: Maximum percentage change of a company in one step
+    :return: (paths, steps + 1) array of the index points
+    """
+    if steps < 1 or paths < 1:
+        raise ValueError(f"Number of steps and paths should be positive integers but received {steps} and {paths}")
+
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers < 1:
+        raise ValueError(f"Number of workers should be a positive integer but received {workers}")
+    workers = min(workers, paths)
+    quotient, remainder = divmod(paths, workers)
+    chunk_sizes = [quotient + 1 if index < remainder else quotient for index in range(workers)]
+    seed_sequences = np.random.SeedSequence(seed).spawn(workers)
+    market_caps = market.market_caps.astype(np.float64)
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        chunks = executor.map(_simulate_points_paths, [market_caps] * workers, [steps] * workers, chunk_sizes,
+                              seed_sequences, [max_percentage_change] * workers)
+        return np.vstack(list(chunks))
 
 
-def stock_market_():
+def stock_market_(cache=None):
     """
     Generate one instance of the market and calculate the change in the market points
+    :param cache: DatasetCache from which the stock data is reused, default cache is used if None and stock data is
+    generated every time if False
     :return:
     """
     # Variables used for the code
@@ -323,7 +3196,7 @@ def stock_market_():
     _new_market_value = []
 
     # Generate the stock data in namedtuple format for 100 companies
-    list_of_companies, opening_market_value, list_of_company_symbol = generate_stock_data(100)
+    list_of_companies, opening_market_value, list_of_company_symbol = cached_generate_stock_data(100, cache=cache)
 
     for _company in list_of_companies:
         new_company_value = add(_company.market_cap, truediv(mul(_company.market_cap, random.randint(-10, 10)), 100))
@@ -338,8 +3211,8 @@ def stock_market_():
 
 
 if __name__ == '__main__':
-    # Part one of comparing performance of named-tuples and dictionaries
+    # Part one of comparing performance of named-tuples and dictionaries, profiles are reused between the runs
     compare_namedtuple_and_dictionaries()
 
-    # Part two of generating stock data
+    # Part two of generating stock data, stock data is reused between the runs
     stock_market_()
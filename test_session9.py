@@ -4,6 +4,9 @@ Author: Shilpaj Bhar
 Date: Jul 06, 2021
 """
 # Standard Library Imports
+import gc
+import pickle
+import weakref
 import pytest
 from statistics import mean
 from decimal import Decimal
@@ -15,12 +18,22 @@ from dateutil.relativedelta import relativedelta
 from faker import Faker
 
 # Local Imports
+import session9
 from session9 import *
 
 fake = Faker()
 Faker.seed(1)
 
 
+@pytest.fixture(scope='session')
+def dataset_cache():
+    """
+    Fixture of the dataset cache used by the tests which do not depend on the exact output of the global Faker instance,
+    profiles generated once are reused in the later runs. Directory can be changed with SESSION9_CACHE_DIR
+    """
+    return DatasetCache()
+
+
 def test_generate_profiles_of_sample_size():
     """
     Test case to check the generated data
@@ -311,23 +324,12 @@ def test_namedtuple_average_age():
     assert (date.today() - date(1800, 1, 1)).days == output.average_age
 
 
-def test_speed():
+def test_speed(dataset_cache):
     """
     Test to check the execution speed of named-tuples and dictionaries to prove that named-tuples are faster
     """
-    # Variables used in this scope
-    list_of_named_tuples = []
-
     # Generate 10K profiles
-    list_of_dictionaries = generate_profiles(10_000)
-
-    # Perform operations on the dictionary
-    start = perf_counter()
-    _ = dictionary_operations(list_of_dictionaries)
-    elapsed_dict = perf_counter() - start
-    print("Output: ", _)
-    print("Operation Time on Dictionary: ", elapsed_dict)
-    print()
+    list_of_dictionaries = cached_generate_profiles(10_000, cache=dataset_cache)
 
     # Sample profile to create named tuple
     sample_profile = list_of_dictionaries[1]
@@ -349,21 +351,19 @@ def test_speed():
     PersonProfile.website.__doc__ = "Websites of an individual in list of String format"
 
     # List of named tuple
-    [list_of_named_tuples.append(PersonProfile(**profile)) for profile in list_of_dictionaries]
-    print(list_of_named_tuples[0])
-    print()
+    list_of_named_tuples = [PersonProfile(**profile) for profile in list_of_dictionaries]
 
-    # Perform operations on the dictionary
-    start = perf_counter()
-    _ = namedtuple_operations(list_of_named_tuples)
-    elapsed_named_tuple = perf_counter() - start
-    print("Output: ", _)
-    print("Operation Time on NamedTuples: ", elapsed_named_tuple)
+    # Compare repeated runs instead of a single noisy measurement
+    stats_dict = benchmark(dictionary_operations, list_of_dictionaries, warmup=2, repeat=15)
+    stats_named_tuple = benchmark(namedtuple_operations, list_of_named_tuples, warmup=2, repeat=15)
+    print("Operation Time on Dictionary: ", stats_dict)
+    print("Operation Time on NamedTuples: ", stats_named_tuple)
 
     print()
-    print(f"Tuples are faster than dictionaries by {elapsed_dict / elapsed_named_tuple} times")
+    print(f"Tuples are faster than dictionaries by {stats_dict['median'] / stats_named_tuple['median']} times")
 
-    assert elapsed_named_tuple < elapsed_dict
+    # Minimum of the repeated runs is the least affected by the load on the machine
+    assert stats_named_tuple['min'] < stats_dict['min']
 
 
 def test_stock_data_generation():
@@ -386,12 +386,12 @@ def test_datatype_of_stock_data():
     assert is_namedtuple_instance(list_of_companies[0])
 
 
-def test_docstring_of_generated_data():
+def test_docstring_of_generated_data(dataset_cache):
     """
     Test case to check if the generated namedtuple data has docstring
     """
     # Generate the stock data in namedtuple format for 100 companies
-    list_of_companies, opening_market_value, list_of_company_symbol = generate_stock_data(100)
+    list_of_companies, opening_market_value, list_of_company_symbol = cached_generate_stock_data(100, cache=dataset_cache)
 
     sample_data = list_of_companies[0]
     assert 'Stock information for a company' in sample_data.__doc__
@@ -445,12 +445,12 @@ def test_symbols():
     assert all(conditions) is True
 
 
-def test_weights_eq_one():
+def test_weights_eq_one(dataset_cache):
     """
     Test case to check if all the companies are weighted properly that is there sum of their weights is one
     """
     # Generate the stock data in namedtuple format for 100 companies
-    list_of_companies, opening_market_value, list_of_company_symbol = generate_stock_data(100)
+    list_of_companies, opening_market_value, list_of_company_symbol = cached_generate_stock_data(100, cache=dataset_cache)
 
     weights = []
     [weights.append(company.company_weight) for company in list_of_companies]
@@ -458,7 +458,7 @@ def test_weights_eq_one():
     assert round(sum(weights)) == 1
 
 
-def test_market_up_condition():
+def test_market_up_condition(dataset_cache):
     """
     Test case to check points output if all the company's stocks are up by 10%
     """
@@ -466,7 +466,7 @@ def test_market_up_condition():
     _new_market_value = []
 
     # Generate the stock data in namedtuple format for 100 companies
-    list_of_companies, opening_market_value, list_of_company_symbol = generate_stock_data(100)
+    list_of_companies, opening_market_value, list_of_company_symbol = cached_generate_stock_data(100, cache=dataset_cache)
 
     for _company in list_of_companies:
         new_company_value = add(_company.market_cap, truediv(mul(_company.market_cap, 10), 100))
@@ -476,7 +476,7 @@ def test_market_up_condition():
     assert current_market_value > opening_market_value
 
 
-def test_market_down_condition():
+def test_market_down_condition(dataset_cache):
     """
     Test case to check points output if all the company's stocks are down by 10%
     """
@@ -484,7 +484,7 @@ def test_market_down_condition():
     _new_market_value = []
 
     # Generate the stock data in namedtuple format for 100 companies
-    list_of_companies, opening_market_value, list_of_company_symbol = generate_stock_data(100)
+    list_of_companies, opening_market_value, list_of_company_symbol = cached_generate_stock_data(100, cache=dataset_cache)
 
     for _company in list_of_companies:
         new_company_value = add(_company.market_cap, truediv(mul(_company.market_cap, -10), 100))
@@ -494,7 +494,7 @@ def test_market_down_condition():
     assert current_market_value < opening_market_value
 
 
-def test_points_up_condition():
+def test_points_up_condition(dataset_cache):
     """
     Test case to check if all the stocks are up by 20% then how much points are added to the market
     """
@@ -502,7 +502,7 @@ def test_points_up_condition():
     _new_market_value = []
 
     # Generate the stock data in namedtuple format for 100 companies
-    list_of_companies, opening_market_value, list_of_company_symbol = generate_stock_data(100)
+    list_of_companies, opening_market_value, list_of_company_symbol = cached_generate_stock_data(100, cache=dataset_cache)
 
     for _company in list_of_companies:
         new_company_value = add(_company.market_cap, truediv(mul(_company.market_cap, 20), 100))
@@ -512,3 +512,912 @@ def test_points_up_condition():
     market_change_in_points = (current_market_value - opening_market_value) / opening_market_value
 
     assert 120 == round(100 + (market_change_in_points * 100))
+
+
+def test_dictionary_operations_single_pass(dataset_cache):
+    """
+    Test case to check the single pass calculations against the values calculated separately
+    """
+    list_of_dictionaries = cached_generate_profiles(100, cache=dataset_cache)
+
+    # Make two profiles share the oldest birthdate
+    list_of_dictionaries[10]['birthdate'] = datetime.date(1800, 1, 1)
+    list_of_dictionaries[50]['birthdate'] = datetime.date(1800, 1, 1)
+
+    days = [(date.today() - profile['birthdate']).days for profile in list_of_dictionaries]
+    output = dictionary_operations(list_of_dictionaries)
+
+    assert output['name_age_of_oldest_person'] == {list_of_dictionaries[10]['name']: max(days),
+                                                   list_of_dictionaries[50]['name']: max(days)}
+    assert output['average_age_of_profiles'] == sum(days) / len(days)
+    assert output['blood_count'] == Counter(profile['blood_group'] for profile in list_of_dictionaries)
+
+
+def test_benchmark_dictionary_operations(dataset_cache):
+    """
+    Test case to check the benchmark reports the time for every dataset size
+    """
+    timings = benchmark_dictionary_operations(sizes=(1_000, 10_000), pool_size=100, cache=dataset_cache)
+
+    assert list(timings.keys()) == [1_000, 10_000]
+    assert all(elapsed > 0 for elapsed in timings.values())
+
+
+def test_profile_table_output(dataset_cache):
+    """
+    Test case to check the columnar calculations give the same output as the namedtuple operations
+    """
+    list_of_dictionaries = cached_generate_profiles(100, cache=dataset_cache)
+    list_of_dictionaries[5]['birthdate'] = datetime.date(1800, 1, 1)
+    list_of_dictionaries[7]['birthdate'] = datetime.date(1800, 1, 1)
+    list_of_named_tuples = convert_profiles(list_of_dictionaries)
+
+    expected = namedtuple_operations(list_of_named_tuples)
+    for profiles in (list_of_dictionaries, list_of_named_tuples):
+        output = ProfileTable.from_profiles(profiles).operations()
+
+        assert type(output).__doc__ == 'NamedTuple for the output of the calculations'
+        assert output.blood_group_count == expected.blood_group_count
+        assert output.name_of_oldest_person == expected.name_of_oldest_person
+        assert output.age == expected.age
+        assert output.average_age == expected.average_age
+        assert output.mean_location == pytest.approx([float(value) for value in expected.mean_location])
+
+
+def test_profile_table_wrong_input():
+    """
+    Test case to check the exceptions raised while building the columnar store
+    """
+    with pytest.raises(ValueError):
+        ProfileTable.from_profiles([])
+
+    with pytest.raises(TypeError):
+        ProfileTable.from_profiles([range(10), range(11, 21)])
+
+
+def test_aggregate_profiles_matches_operations(dataset_cache):
+    """
+    Test case to check the chunked aggregation gives the same output as the namedtuple operations
+    """
+    list_of_dictionaries = cached_generate_profiles(50, cache=dataset_cache)
+    list_of_dictionaries[3]['birthdate'] = datetime.date(1800, 1, 1)
+    list_of_dictionaries[42]['birthdate'] = datetime.date(1800, 1, 1)
+    list_of_named_tuples = convert_profiles(list_of_dictionaries)
+
+    expected = namedtuple_operations(list_of_named_tuples)
+    assert aggregate_profiles(iter(list_of_named_tuples), chunk_size=7) == expected
+    assert aggregate_profiles(profile for profile in list_of_dictionaries) == expected
+
+
+def test_profile_aggregator_merge(dataset_cache):
+    """
+    Test case to check the merged aggregates are same as the aggregates of all the profiles
+    """
+    list_of_dictionaries = cached_generate_profiles(20, cache=dataset_cache)
+    for profile in list_of_dictionaries[::5]:
+        profile['birthdate'] = datetime.date(1800, 1, 1)
+
+    first = ProfileAggregator().update(list_of_dictionaries[:10])
+    second = ProfileAggregator().update(list_of_dictionaries[10:])
+
+    assert first.merge(second).result() == ProfileAggregator().update(list_of_dictionaries).result()
+    assert first.result().name_of_oldest_person == [profile['name'] for profile in list_of_dictionaries[::5]]
+
+    with pytest.raises(ValueError):
+        ProfileAggregator().result()
+
+
+def test_generate_profiles_parallel_is_reproducible():
+    """
+    Test case to check the parallel generation returns the same profiles for the same seed and number of workers
+    """
+    profiles = generate_profiles_parallel(21, workers=2, seed=5)
+
+    assert len(profiles) == 21
+    assert all(type(profile) is dict for profile in profiles)
+    assert profiles == generate_profiles_parallel(21, workers=2, seed=5)
+    assert profiles != generate_profiles_parallel(21, workers=2, seed=6)
+
+    with pytest.raises(ValueError):
+        generate_profiles_parallel(21, workers=0)
+
+
+def test_namedtuple_operations_parallel(dataset_cache):
+    """
+    Test case to check the parallel namedtuple operations give the same output as the serial operations
+    """
+    list_of_dictionaries = cached_generate_profiles(30, cache=dataset_cache)
+    list_of_named_tuples = convert_profiles(list_of_dictionaries)
+
+    # Oldest persons in different shards
+    for index in (2, 17, 29):
+        list_of_named_tuples[index] = list_of_named_tuples[index]._replace(birthdate=datetime.date(1800, 1, 1))
+
+    output = namedtuple_operations(list_of_named_tuples, workers=3)
+
+    assert output == namedtuple_operations(list_of_named_tuples)
+    assert output.name_of_oldest_person == [list_of_named_tuples[index].name for index in (2, 17, 29)]
+    assert 'NamedTuple for the output of the calculations' in output.__doc__
+
+    for workers in (0, -1):
+        with pytest.raises(ValueError):
+            namedtuple_operations(list_of_named_tuples, workers=workers)
+
+
+def test_compact_profiles(dataset_cache):
+    """
+    Test case to check the compact profiles can be used like namedtuples for the calculations
+    """
+    list_of_dictionaries = cached_generate_profiles(10, cache=dataset_cache)
+    list_of_named_tuples = convert_profiles(list_of_dictionaries)
+    compact_profiles = to_compact_profiles(list_of_named_tuples)
+
+    assert is_namedtuple_instance(compact_profiles[0])
+    assert compact_profiles[0].birthdate == list_of_named_tuples[0].birthdate
+    assert compact_profiles[0].current_location == tuple(map(float, list_of_named_tuples[0].current_location))
+
+    expected = namedtuple_operations(list_of_named_tuples)
+    output = namedtuple_operations(compact_profiles)
+    assert output.blood_group_count == expected.blood_group_count
+    assert output.average_age == expected.average_age
+    assert output.mean_location == pytest.approx([float(value) for value in expected.mean_location])
+
+
+def test_profile_memory_report(dataset_cache):
+    """
+    Test case to check the compact profiles use less memory than dictionaries and namedtuples
+    """
+    report = profile_memory_report(cached_generate_profiles(100, cache=dataset_cache))
+
+    assert report['compact'] < report['namedtuple'] < report['dictionary']
+
+
+def test_benchmark_statistics():
+    """
+    Test case to check the statistics reported by the benchmark harness
+    """
+    stats = benchmark(sorted, list(range(1000)), warmup=1, repeat=20)
+
+    assert stats['repeat'] == 20
+    assert stats['min'] <= stats['median'] <= stats['p95']
+    assert stats['stddev'] >= 0
+
+
+def test_run_benchmark_suite(tmp_path, dataset_cache):
+    """
+    Test case to check the benchmark suite saves the results of every backend and size as JSON
+    """
+    output_path = tmp_path / 'benchmark.json'
+    report = run_benchmark_suite(sizes=(100, 200), backends=('dictionary', 'namedtuple', 'columnar'), pool_size=50,
+                                 warmup=0, repeat=2, output_path=output_path, cache=dataset_cache)
+
+    assert set(report['results']) == {'dictionary', 'namedtuple', 'columnar'}
+    assert set(report['results']['columnar']) == {'100', '200'}
+
+    ratios = compare_benchmark_results(output_path, output_path)
+    assert all(ratio == 1 for ratio in ratios.values())
+
+
+def test_reference_date(dataset_cache):
+    """
+    Test case to check the ages are calculated from the reference date passed to the operations
+    """
+    list_of_dictionaries = cached_generate_profiles(10, cache=dataset_cache)
+    for profile in list_of_dictionaries:
+        profile['birthdate'] = datetime.date(2000, 1, 1)
+    list_of_named_tuples = convert_profiles(list_of_dictionaries)
+    reference_date = datetime.date(2000, 1, 31)
+
+    assert dictionary_operations(list_of_dictionaries, reference_date=reference_date)['average_age_of_profiles'] == 30
+    assert namedtuple_operations(list_of_named_tuples, reference_date=reference_date).age == 30
+    assert namedtuple_operations(list_of_named_tuples, workers=2, reference_date=reference_date).age == 30
+    assert ProfileTable.from_profiles(list_of_named_tuples).operations(reference_date=reference_date).age == 30
+    assert aggregate_profiles(list_of_dictionaries, reference_date=reference_date).average_age == 30
+
+
+def test_incremental_profile_stats(dataset_cache):
+    """
+    Test case to check the incremental statistics match the operations on the current profiles after adds and removes
+    """
+    list_of_dictionaries = cached_generate_profiles(20, cache=dataset_cache)
+    list_of_named_tuples = convert_profiles(list_of_dictionaries)
+    list_of_named_tuples[4] = list_of_named_tuples[4]._replace(birthdate=datetime.date(1800, 1, 1))
+    list_of_named_tuples[9] = list_of_named_tuples[9]._replace(birthdate=datetime.date(1800, 1, 1))
+
+    stats = IncrementalProfileStats(list_of_named_tuples)
+    assert stats.result() == namedtuple_operations(list_of_named_tuples)
+
+    # Remove one of the two oldest persons and then the other one
+    stats.remove(list_of_named_tuples[4])
+    remaining = list_of_named_tuples[:4] + list_of_named_tuples[5:]
+    assert stats.result() == namedtuple_operations(remaining)
+
+    stats.remove(list_of_named_tuples[9])
+    remaining = remaining[:8] + remaining[9:]
+    output = stats.result()
+    assert output.age == namedtuple_operations(remaining).age
+    assert output.blood_group_count == namedtuple_operations(remaining).blood_group_count
+    assert len(stats) == 18
+
+    # Add back one of the oldest persons
+    stats.add(list_of_named_tuples[9])
+    assert stats.result().name_of_oldest_person == [list_of_named_tuples[9].name]
+
+    with pytest.raises(ValueError):
+        stats.remove(list_of_named_tuples[4])
+
+
+def test_convert_profiles(dataset_cache):
+    """
+    Test case to check the bulk conversion gives the same namedtuples as keyword unpacking
+    """
+    list_of_dictionaries = cached_generate_profiles(10, cache=dataset_cache)
+    PersonProfile = create_person_profile_namedtuple(sorted(list_of_dictionaries[0].keys()))
+    expected = [PersonProfile(**profile) for profile in list_of_dictionaries]
+
+    assert convert_profiles(list_of_dictionaries, PersonProfile) == expected
+    assert list(convert_profiles(iter(list_of_dictionaries), PersonProfile, lazy=True)) == expected
+
+    converted = convert_profiles(list_of_dictionaries)
+    assert converted == expected
+    assert 'Profile of an individual' in converted[0].__doc__
+    assert 'Alias for field number' not in type(converted[0]).birthdate.__doc__
+
+    with pytest.raises(ValueError):
+        convert_profiles([])
+    with pytest.raises(TypeError):
+        convert_profiles(expected)
+
+
+def test_benchmark_profile_conversion(dataset_cache):
+    """
+    Test case to check the conversion benchmark reports the throughput of every method
+    """
+    throughput = benchmark_profile_conversion(number_of_samples=1_000, pool_size=100, repeat=1, cache=dataset_cache)
+
+    assert set(throughput) == {'keyword_unpacking', 'bulk', 'bulk_lazy'}
+    assert all(rate > 0 for rate in throughput.values())
+
+
+def test_stock_market_generation():
+    """
+    Test case to check the vectorized stock data generation and export to namedtuples
+    """
+    market = StockMarket.generate(1_000, seed=3, batch_size=300)
+    list_of_companies, opening_market_value, list_of_company_symbol = market.stock_data()
+
+    assert len(market) == len(list_of_companies) == 1_000
+    assert round(market.weights.sum(), 9) == 1
+    assert opening_market_value == sum(company.market_cap for company in list_of_companies)
+    assert all((company.high >= company.open) and (company.high >= company.close) for company in list_of_companies)
+    assert is_namedtuple_instance(list_of_companies[0])
+    assert 'Stock information for a company' in list_of_companies[0].__doc__
+    assert market.company(10) == list_of_companies[10]
+
+    # Same seed generates the same market
+    assert StockMarket.generate(1_000, seed=3, batch_size=300).to_namedtuples() == list_of_companies
+
+
+def test_simulate_market():
+    """
+    Test case to check the multi-day simulation of the market
+    """
+    market = StockMarket.generate(50, seed=1)
+    simulation = simulate_market(market, steps=20, seed=2)
+
+    assert simulation.market_caps.shape == simulation.share_prices.shape == (21, 50)
+    assert simulation.points.shape == (21,)
+    assert simulation.points[0] == pytest.approx(100)
+    assert (simulation.market_caps[1:] > 0).all()
+    assert 'simulation of the market' in simulation.__doc__
+
+    # Index points are the market value at each step relative to the opening market value
+    assert simulation.points[-1] == pytest.approx(100 * simulation.market_caps[-1].sum() / market.opening_market_value)
+
+
+def test_monte_carlo_market_points():
+    """
+    Test case to check the Monte Carlo paths are reproducible for the same seed and number of workers
+    """
+    market = StockMarket.generate(30, seed=1)
+    points = monte_carlo_market_points(market, steps=10, paths=7, workers=2, seed=4)
+
+    assert points.shape == (7, 11)
+    assert np.allclose(points[:, 0], 100)
+    assert np.array_equal(points, monte_carlo_market_points(market, steps=10, paths=7, workers=2, seed=4))
+
+    with pytest.raises(ValueError):
+        monte_carlo_market_points(market, steps=10, paths=7, workers=0)
+
+
+def test_symbol_allocator():
+    """
+    Test case to check the allocated symbols are unique even for the companies with same names
+    """
+    allocator = SymbolAllocator(symbol_length=3)
+    symbols = [allocator.allocate('Smith, Jones and Sons') for _ in range(50)]
+
+    assert symbols[0] == 'SMI'
+    # Only a few symbols are derived from a repeated name before the next free symbol is taken
+    assert symbols[1:6] == ['SMT', 'SMH', 'SMJ', 'SMK', 'SML']
+    assert len(set(symbols)) == 50
+    assert all(len(symbol) == 3 and symbol.isalpha() and symbol.isupper() for symbol in symbols)
+    assert 'SMI' in allocator and len(allocator) == 50
+
+    # Names with less letters than the symbol length also get a symbol
+    assert len(allocator.allocate('3M')) == 3
+
+    small_allocator = SymbolAllocator(symbol_length=1)
+    [small_allocator.allocate('A') for _ in range(26)]
+    with pytest.raises(ValueError):
+        small_allocator.allocate('A')
+
+
+def test_symbol_index():
+    """
+    Test case to check the lookup of companies by symbol
+    """
+    list_of_companies, opening_market_value, list_of_company_symbol = generate_stock_data(100)
+    index = build_symbol_index(list_of_companies)
+
+    assert len(set(list_of_company_symbol)) == 100
+    assert all(index[company.symbol] is company for company in list_of_companies)
+
+    market = StockMarket.generate(100, seed=1)
+    assert market.company_by_symbol(market.symbols[42]) == market.company(42)
+
+
+def test_mapped_profile_dataset(tmp_path, dataset_cache):
+    """
+    Test case to check the profiles written to the binary dataset are read back from the memory-mapped file
+    """
+    list_of_dictionaries = cached_generate_profiles(20, cache=dataset_cache)
+    list_of_dictionaries[7]['website'] = []
+    path = tmp_path / 'profiles.bin'
+    write_profile_dataset(path, list_of_dictionaries)
+
+    with MappedProfileDataset(path) as dataset:
+        assert len(dataset) == 20
+        assert dataset[0] == list_of_dictionaries[0]
+        assert dataset[7] == list_of_dictionaries[7]
+        assert list(dataset[-1].keys()) == list(list_of_dictionaries[-1].keys())
+
+        output = dataset.table().operations()
+        assert output == ProfileTable.from_profiles(list_of_dictionaries).operations()
+        del output
+
+    with pytest.raises(ValueError):
+        (tmp_path / 'other.bin').write_bytes(b'0' * 64)
+        MappedProfileDataset(tmp_path / 'other.bin')
+
+    # Empty and truncated files and invalid headers are reported the same way
+    valid = path.read_bytes()
+    header = DATASET_HEADER.pack(DATASET_MAGIC, 12)
+    for content in (b'', DATASET_MAGIC, valid[:DATASET_HEADER.size + 10], header + b'{"count": 1}' + b'0' * 64,
+                    header + b'{"garbage"  ' + b'0' * 64, valid[:len(valid) // 2]):
+        (tmp_path / 'short.bin').write_bytes(content)
+        with pytest.raises(ValueError, match='is not a profile dataset'):
+            MappedProfileDataset(tmp_path / 'short.bin')
+
+
+def test_dataset_cache(tmp_path):
+    """
+    Test case to check the generated datasets are reused from the cache and invalid files are generated again
+    """
+    cache = DatasetCache(tmp_path)
+    profiles = cached_generate_profiles(10, seed=3, cache=cache)
+    key = DatasetCache.key('profiles', 3, 10, ['profile'])
+
+    assert cache.get(key) == profiles
+    assert cached_generate_profiles(10, seed=3, cache=cache) == profiles
+
+    # Cached file is a checksum followed by plain JSON
+    path = tmp_path / f'{key}.json'
+    assert json.loads(path.read_bytes()[32:])['key'] == key
+
+    # Corrupt the cached file
+    path.write_bytes(path.read_bytes()[:-1] + b'0')
+    assert cache.get(key) is None
+    assert not path.exists()
+    assert cached_generate_profiles(10, seed=3, cache=cache) == profiles
+
+    list_of_companies, opening_market_value, list_of_company_symbol = cached_generate_stock_data(20, cache=cache)
+    assert cached_generate_stock_data(20, cache=cache) == (list_of_companies, opening_market_value,
+                                                           list_of_company_symbol)
+    assert 'Stock information for a company' in list_of_companies[0].__doc__
+
+    # Datasets are generated every time without the cache
+    assert cached_generate_stock_data(20, cache=False) == (list_of_companies, opening_market_value,
+                                                           list_of_company_symbol)
+    assert cached_generate_profiles(10, seed=3, cache=False) == profiles
+
+
+def test_dataset_cache_eviction(tmp_path):
+    """
+    Test case to check the least recently used datasets are removed when the cache is full
+    """
+    cache = DatasetCache(tmp_path, max_bytes=2_500)
+    cache.put('first', '1' * 1_000)
+    cache.put('second', '2' * 1_000)
+    os.utime(tmp_path / 'first.json', (0, 0))
+    os.utime(tmp_path / 'second.json', (1, 1))
+    cache.put('third', '3' * 1_000)
+
+    assert cache.get('first') is None
+    assert cache.get('second') == '2' * 1_000
+    assert cache.get('third') == '3' * 1_000
+
+
+def test_profile_sequence():
+    """
+    Test case to check the lazy profile sequence is deterministic and accepted by the operations
+    """
+    profiles = ProfileSequence(10_000_000, seed=1, cache_size=8)
+
+    assert len(profiles) == 10_000_000
+    assert profiles[123_456] == ProfileSequence(10_000_000, seed=1)[123_456]
+    assert profiles[-1] == profiles[9_999_999]
+
+    sample = profiles[1_000:1_020]
+    assert len(sample) == 20
+    assert sample[0] == profiles[1_000]
+    assert dictionary_operations(sample)['blood_count'] == Counter(profile['blood_group'] for profile in sample)
+    assert len(profiles._cache) <= 8
+
+    PersonProfile = create_person_profile_namedtuple(sorted(profiles[0].keys()))
+    sample_of_named_tuples = ProfileSequence(10_000_000, seed=1, profile_type=PersonProfile)[1_000:1_020]
+    output = namedtuple_operations(sample_of_named_tuples)
+    assert output.blood_group_count == dictionary_operations(sample)['blood_count']
+
+    # Every profile of a sequence larger than its cache is generated once by the operations
+    sequence = ProfileSequence(30, seed=1, cache_size=8, profile_type=PersonProfile)
+    generated = []
+    generate = sequence._fake.profile
+    sequence._fake.profile = lambda *args: generated.append(args) or generate(*args)
+    expected = namedtuple_operations(list(ProfileSequence(30, seed=1, profile_type=PersonProfile)))
+    assert namedtuple_operations(sequence) == expected
+    assert len(generated) == 30
+
+    with pytest.raises(IndexError):
+        profiles[10_000_000]
+
+
+def test_aggregate_profile_stream(dataset_cache):
+    """
+    Test case to check the asynchronous pipeline publishes a snapshot per batch and the final snapshot is same as
+    aggregating all the profiles
+    """
+    list_of_dictionaries = cached_generate_profiles(25, cache=dataset_cache)
+
+    async def consume():
+        source = InProcessProfileSource(maxsize=5)
+        producer = asyncio.ensure_future(source.feed(list_of_dictionaries))
+        snapshots = [snapshot async for snapshot in aggregate_profile_stream(source, batch_size=10)]
+        await producer
+        return snapshots
+
+    snapshots = asyncio.run(consume())
+
+    assert len(snapshots) == 3
+    assert sum(snapshots[0].blood_group_count.values()) == 10
+    assert snapshots[-1] == aggregate_profiles(list_of_dictionaries)
+
+
+def test_aggregate_profile_stream_process_executor(dataset_cache):
+    """
+    Test case to check the asynchronous pipeline aggregates the batches in a process pool
+    """
+    list_of_dictionaries = cached_generate_profiles(20, cache=dataset_cache)
+
+    async def consume(executor):
+        source = InProcessProfileSource()
+        await source.feed(list_of_dictionaries)
+        return [snapshot async for snapshot in aggregate_profile_stream(source, batch_size=7, executor=executor)]
+
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        snapshots = asyncio.run(consume(executor))
+
+    assert len(snapshots) == 3
+    assert snapshots[-1] == aggregate_profiles(list_of_dictionaries)
+
+
+def test_aggregate_profile_stream_early_exit(dataset_cache):
+    """
+    Test case to check the reader task of the asynchronous pipeline is finished when the consumer stops early while
+    the batch queue is full
+    """
+    list_of_dictionaries = cached_generate_profiles(50, cache=dataset_cache)
+
+    async def consume():
+        source = InProcessProfileSource()
+        await source.feed(list_of_dictionaries)
+        stream = aggregate_profile_stream(source, batch_size=5, max_pending_batches=1)
+        async for snapshot in stream:
+            assert sum(snapshot.blood_group_count.values()) == 5
+            break
+        await stream.aclose()
+        return [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+
+    assert asyncio.run(consume()) == []
+
+
+def test_instrumentation():
+    """
+    Test case to check the phases of the calculations are recorded only when the instrumentation is enabled
+    """
+    with instrument() as instrumentation:
+        list_of_dictionaries = generate_profiles(20)
+        list_of_named_tuples = convert_profiles(list_of_dictionaries)
+        dictionary_operations(list_of_dictionaries)
+        namedtuple_operations(list_of_named_tuples)
+        ProfileTable.from_profiles(list_of_named_tuples).operations()
+
+    report = instrumentation.report()
+    expected_phases = ['generation', 'conversion', 'dictionary.single_pass', 'dictionary.mean',
+                       'namedtuple.field_extraction', 'namedtuple.counter', 'namedtuple.mean', 'namedtuple.age',
+                       'namedtuple.oldest_person', 'columnar.counter', 'columnar.mean', 'columnar.age',
+                       'columnar.oldest_person']
+    assert list(report) == expected_phases
+    assert report['generation']['allocated_bytes'] > 0
+    assert json.loads(instrumentation.to_json()) == report
+
+    # Nothing is recorded after the instrumentation is disabled
+    namedtuple_operations(list_of_named_tuples)
+    assert len(instrumentation.records) == len(expected_phases)
+
+
+def test_cached_namedtuple_types(dataset_cache):
+    """
+    Test case to check the namedtuple types are created once and their instances can be pickled
+    """
+    list_of_dictionaries = cached_generate_profiles(10, cache=dataset_cache)
+    fields = sorted(list_of_dictionaries[0].keys())
+    list_of_named_tuples = convert_profiles(list_of_dictionaries)
+
+    assert create_output_namedtuple() is create_output_namedtuple()
+    assert create_company_stock_namedtuple() is create_company_stock_namedtuple()
+    assert create_person_profile_namedtuple(fields) is create_person_profile_namedtuple(tuple(fields))
+    assert type(list_of_named_tuples[0]) is create_person_profile_namedtuple(fields)
+
+    output = namedtuple_operations(list_of_named_tuples)
+    assert type(output) is type(namedtuple_operations(list_of_named_tuples))
+    assert type(pickle.loads(pickle.dumps(output))) is type(output)
+
+    profile = pickle.loads(pickle.dumps(list_of_named_tuples[0]))
+    assert profile == list_of_named_tuples[0] and type(profile) is type(list_of_named_tuples[0])
+
+    # Type is same even after many other field sets are used
+    for index in range(200):
+        create_person_profile_namedtuple(fields + [f'extra_{index}'])
+    assert create_person_profile_namedtuple(fields) is type(list_of_named_tuples[0])
+
+    list_of_companies, _, _ = generate_stock_data(5)
+    assert pickle.loads(pickle.dumps(list_of_companies)) == list_of_companies
+
+
+def test_is_namedtuple_instance_cache():
+    """
+    Test case to check the verdicts are cached per type without keeping the dynamically created types alive
+    """
+    Point = namedtuple('Point', 'x y')
+    assert is_namedtuple_instance(Point(1, 2))
+    assert not is_namedtuple_instance((1, 2))
+    assert Point in session9._namedtuple_type_verdicts
+
+    type_reference = weakref.ref(Point)
+    del Point
+    gc.collect()
+    assert type_reference() is None
+
+
+def test_validate_records(dataset_cache):
+    """
+    Test case to check the index of the first record which is not of the type of the first namedtuple is reported
+    """
+    list_of_named_tuples = convert_profiles(cached_generate_profiles(10, cache=dataset_cache))
+
+    assert validate_records(list_of_named_tuples) is None
+    assert validate_records([dict()] + list_of_named_tuples) == 0
+
+    mixed = list(list_of_named_tuples)
+    mixed[6] = tuple(mixed[6])
+    mixed[8] = mixed[8]._asdict()
+    assert validate_records(mixed) == 6
+
+    with pytest.raises(ValueError):
+        validate_records([])
+
+
+def test_mean_location_modes(dataset_cache):
+    """
+    Test case to check the fixed point mean is exact and the float mean is close to the Decimal mean
+    """
+    locations = [profile['current_location'] for profile in cached_generate_profiles(100, cache=dataset_cache)]
+    exact = mean_location(locations, mode='exact')
+
+    assert exact == (mean([x for x, _ in locations]), mean([y for _, y in locations]))
+    assert mean_location(locations, mode='fixed', batch_size=7) == exact
+    assert mean_location(locations, mode='fast', batch_size=7) == pytest.approx([float(value) for value in exact])
+    assert mean_location(np.array(locations, dtype=np.float64), mode='fixed') == exact
+
+    # Fixed point mean of the float columns of the table is same as the Decimal mean
+    profiles = cached_generate_profiles(100, cache=dataset_cache)
+    table = ProfileTable.from_profiles(profiles)
+    expected = namedtuple_operations(convert_profiles(profiles)).mean_location
+    assert table.operations(location_mode='fixed', batch_size=7).mean_location == expected
+    assert table.operations().mean_location == pytest.approx([float(value) for value in expected])
+    with pytest.raises(ValueError):
+        table.operations(location_mode='exact')
+
+    with pytest.raises(ValueError):
+        mean_location(locations, mode='approximate')
+
+
+def test_benchmark_location_modes(dataset_cache):
+    """
+    Test case to check the location benchmark reports the time and error of every mode
+    """
+    report = benchmark_location_modes(number_of_samples=1_000, pool_size=100, repeat=1, cache=dataset_cache)
+
+    assert set(report) == {'exact', 'fixed', 'fast'}
+    assert report['exact']['error'] == report['fixed']['error'] == 0
+    assert report['fast']['error'] < 1e-9
+    assert report['exact']['array_seconds'] is None and report['fast']['array_seconds'] > 0
+
+
+def test_group_profiles_by(dataset_cache):
+    """
+    Test case to check the aggregates of every group match the aggregates of the profiles of that group
+    """
+    profiles = convert_profiles(cached_generate_profiles(200, cache=dataset_cache))
+    reference_date = datetime.date(2021, 1, 1)
+    groups = group_profiles_by(profiles, 'blood_group', chunk_size=30, reference_date=reference_date)
+
+    assert sum(stats.count for stats in groups.values()) == len(profiles)
+    for blood_group, stats in groups.items():
+        members = [profile for profile in profiles if profile.blood_group == blood_group]
+        expected = namedtuple_operations(members, reference_date=reference_date)
+        assert stats == (len(members), expected.mean_location, expected.average_age, expected.age)
+
+    by_sex_and_group = group_profiles_by(profiles, ('sex', 'blood_group'), reference_date=reference_date)
+    assert sum(stats.count for stats in by_sex_and_group.values()) == len(profiles)
+    assert {blood_group for _, blood_group in by_sex_and_group} == set(groups)
+
+    with pytest.raises(ValueError):
+        group_profiles_by([], 'sex')
+
+
+def test_profile_group_by_merge(dataset_cache):
+    """
+    Test case to check merged group-by of shards is same as the group-by of all the profiles
+    """
+    profiles = cached_generate_profiles(100, cache=dataset_cache)
+    reference_date = datetime.date(2021, 1, 1)
+    merged = ProfileGroupBy('sex', reference_date=reference_date).update(profiles[:40])
+    merged.merge(ProfileGroupBy('sex', reference_date=reference_date).update(profiles[40:]))
+
+    assert merged.result() == group_profiles_by(profiles, 'sex', reference_date=reference_date)
+    with pytest.raises(ValueError):
+        merged.merge(ProfileGroupBy('company'))
+
+
+def test_profile_table_group_by_blood_group(dataset_cache):
+    """
+    Test case to check the vectorized group-by is same as the group-by of the profiles
+    """
+    profiles = cached_generate_profiles(100, cache=dataset_cache)
+    reference_date = datetime.date(2021, 1, 1)
+    expected = group_profiles_by(profiles, 'blood_group', reference_date=reference_date)
+    groups = ProfileTable.from_profiles(profiles).group_by_blood_group(reference_date=reference_date)
+
+    assert groups.keys() == expected.keys()
+    for blood_group, stats in groups.items():
+        assert stats.count == expected[blood_group].count
+        assert stats.age == expected[blood_group].age
+        assert stats.average_age == pytest.approx(expected[blood_group].average_age)
+        assert stats.mean_location == pytest.approx([float(value) for value in expected[blood_group].mean_location])
+
+
+def test_top_k_profiles(dataset_cache):
+    """
+    Test case to check the top k profiles are same as the profiles selected by sorting
+    """
+    profiles = convert_profiles(cached_generate_profiles(200, cache=dataset_cache))
+    by_birthdate = sorted(profiles, key=attrgetter('birthdate'))
+
+    oldest = oldest_profiles(profiles, k=5)
+    assert [profile.birthdate for profile in oldest[:5]] == [profile.birthdate for profile in by_birthdate[:5]]
+    assert all(profile.birthdate == by_birthdate[4].birthdate for profile in oldest[5:])
+    assert youngest_profiles(profiles, k=3)[0] == by_birthdate[-1]
+
+    location = profiles[0].current_location
+    assert closest_profiles(profiles, location, k=1)[0] == profiles[0]
+
+    # Parallel selection is same as the serial selection
+    assert oldest_profiles(profiles, k=5, workers=2) == oldest
+    for workers in (0, -1):
+        with pytest.raises(ValueError):
+            oldest_profiles(profiles, k=5, workers=workers)
+
+
+def test_top_k_profiles_ties(dataset_cache):
+    """
+    Test case to check the profiles tied with the k-th profile are returned in the order they were received
+    """
+    profiles = convert_profiles(cached_generate_profiles(3, cache=dataset_cache))
+    birthdate = datetime.date(1950, 1, 1)
+    tied = [profile._replace(birthdate=birthdate, name=str(index)) for index, profile in enumerate(profiles * 2)]
+    younger = profiles[0]._replace(birthdate=datetime.date(2000, 1, 1))
+
+    assert oldest_profiles([younger] + tied, k=2) == tied
+    assert oldest_profiles(tied + [younger], k=len(tied) + 1) == tied + [younger]
+
+    top_k = TopKProfiles(2, order='oldest').update(tied[:3])
+    top_k.merge(TopKProfiles(2, order='oldest').update([younger] + tied[3:]))
+    assert top_k.result() == tied
+
+    with pytest.raises(ValueError):
+        TopKProfiles(2, order='closest')
+
+
+def test_aggregate_profile_stream_top_k(dataset_cache):
+    """
+    Test case to check the asynchronous pipeline can be used with the top k aggregator
+    """
+    list_of_dictionaries = cached_generate_profiles(25, cache=dataset_cache)
+
+    async def consume():
+        source = InProcessProfileSource(maxsize=5)
+        producer = asyncio.ensure_future(source.feed(list_of_dictionaries))
+        snapshots = [snapshot async for snapshot in aggregate_profile_stream(source, batch_size=10,
+                                                                             aggregator=TopKProfiles(3))]
+        await producer
+        return snapshots
+
+    snapshots = asyncio.run(consume())
+
+    assert len(snapshots) == 3
+    assert snapshots[-1] == oldest_profiles(list_of_dictionaries, k=3)
+
+
+def test_location_grid_queries(dataset_cache):
+    """
+    Test case to check the radius, bounding box and nearest queries of the index are same as a linear scan
+    """
+    profiles = convert_profiles(cached_generate_profiles(300, cache=dataset_cache))
+    grid = LocationGrid.from_profiles(profiles, cell_size=10)
+    location, radius = profiles[0].current_location, 30
+
+    def distance(profile):
+        return ((float(profile.current_location[0]) - float(location[0])) ** 2
+                + (float(profile.current_location[1]) - float(location[1])) ** 2)
+
+    in_box = [profile for profile in profiles
+              if -10 <= profile.current_location[0] <= 30 and -20 <= profile.current_location[1] <= 40]
+
+    assert grid.within_radius(location, radius) == [profile for profile in profiles if distance(profile) <= radius ** 2]
+    assert grid.within_bbox((-10, -20), (30, 40)) == in_box
+    assert grid.nearest(location, k=5) == sorted(profiles, key=distance)[:5]
+    assert grid.nearest(location, k=len(profiles) + 1) == sorted(profiles, key=distance)
+
+    # Searches covering more cells than the occupied cells scan all the profiles
+    fine_grid = LocationGrid.from_profiles(profiles, cell_size=0.1)
+    assert fine_grid.nearest(location, k=len(profiles)) == sorted(profiles, key=distance)
+    assert fine_grid.within_radius(location, 500) == profiles
+    assert fine_grid.within_bbox((-10, -20), (30, 40)) == in_box
+    assert grid.query_nearest([location, profiles[1].current_location], k=1) == [[profiles[0]], [profiles[1]]]
+
+
+def test_location_grid_batch_queries(dataset_cache):
+    """
+    Test case to check the batch queries grouped by cell are same as a linear scan for every location
+    """
+    profiles = convert_profiles(cached_generate_profiles(300, cache=dataset_cache))
+    grid = LocationGrid.from_profiles(profiles, cell_size=10)
+    # Locations near each other share a cell and are queried together
+    locations = [(float(x) + offset, float(y) - offset) for x, y in
+                 (profile.current_location for profile in profiles[:40]) for offset in (0, 0.5, 3)]
+
+    def by_distance(location):
+        return sorted(profiles, key=lambda profile: (float(profile.current_location[0]) - location[0]) ** 2
+                      + (float(profile.current_location[1]) - location[1]) ** 2)
+
+    assert grid.query_radius(locations, 25) == [session9._linear_within_radius(profiles, location, 25)
+                                                for location in locations]
+    assert grid.query_nearest(locations, 4) == [by_distance(location)[:4] for location in locations]
+    assert grid.query_radius([], 25) == grid.query_nearest([], 4) == []
+
+
+def test_location_grid_insert(dataset_cache):
+    """
+    Test case to check the profiles inserted one at a time are same as the bulk built index
+    """
+    profiles = convert_profiles(cached_generate_profiles(100, cache=dataset_cache))
+    bulk = LocationGrid.from_profiles(profiles[:50], cell_size=5)
+    incremental = LocationGrid(cell_size=5)
+    for profile in profiles:
+        incremental.insert(profile)
+    for profile in profiles[50:]:
+        bulk.insert(profile)
+
+    locations = [profile.current_location for profile in profiles[::10]]
+    assert len(bulk) == len(incremental) == len(profiles)
+    assert bulk.query_radius(locations, 20) == incremental.query_radius(locations, 20)
+    assert bulk.query_nearest(locations, 3) == incremental.query_nearest(locations, 3)
+    assert LocationGrid().nearest((0, 0)) == []
+
+
+def test_benchmark_location_grid(dataset_cache):
+    """
+    Test case to check the spatial index benchmark reports the time of the index and the linear scan
+    """
+    report = benchmark_location_grid(number_of_samples=1_000, pool_size=100, number_of_queries=5, repeat=1,
+                                     cache=dataset_cache)
+
+    assert set(report) == {'build', 'radius', 'nearest', 'linear_radius'}
+    assert all(seconds > 0 for seconds in report.values())
+
+
+def test_indexed_profile_collection(dataset_cache):
+    """
+    Test case to check the profiles are found with the unique and non-unique indexes after inserts and deletes
+    """
+    profiles = convert_profiles(cached_generate_profiles(50, cache=dataset_cache))
+    collection = IndexedProfileCollection(profiles[:40], non_unique=('mail', 'blood_group'))
+    collection.insert(profiles[40])
+
+    assert len(collection) == 41
+    assert collection.get('ssn', profiles[10].ssn) == profiles[10]
+    assert collection.find('mail', profiles[40].mail) == [profiles[40]]
+    assert collection.find('blood_group', 'A+') == [profile for profile in profiles[:41] if profile.blood_group == 'A+']
+
+    removed = collection.delete(10)
+    assert removed == profiles[10]
+    assert collection.get('ssn', profiles[10].ssn) is None
+    assert profiles[10] not in collection.find('blood_group', profiles[10].blood_group)
+
+    collection.add_index('name')
+    assert collection.find('name', profiles[20].name) == [profiles[20]]
+    with pytest.raises(KeyError):
+        collection.find('job', profiles[20].job)
+
+
+def test_indexed_profile_collection_violations(dataset_cache):
+    """
+    Test case to check the uniqueness violations are reported and no profile is inserted
+    """
+    profiles = cached_generate_profiles(20, cache=dataset_cache)
+    collection = IndexedProfileCollection(profiles[:10])
+
+    with pytest.raises(ValueError):
+        collection.insert(profiles[5])
+    with pytest.raises(ValueError):
+        collection.extend([profiles[15], profiles[15]])
+    assert len(collection) == 10
+    assert collection.get('ssn', profiles[15]['ssn']) is None
+
+    # Violating profiles are recorded and the other profiles are inserted
+    ids = collection.extend([profiles[15], profiles[5], profiles[15], profiles[16]], skip_violations=True)
+    assert ids[0] is not None and ids[1] is None and ids[2] is None and ids[3] is not None
+    assert len(collection) == 12
+    assert [(field, profile) for field, _, profile in collection.violations] == [('ssn', profiles[5]),
+                                                                                 ('ssn', profiles[15])]
+
+    collection.add_index('blood_group')
+    with pytest.raises(ValueError):
+        collection.add_index('sex', unique=True)
+
+
+def test_indexed_profile_collection_defaults(dataset_cache):
+    """
+    Test case to check the collection with the default indexes can be built from the generated profiles, which
+    repeat usernames and mails
+    """
+    profiles = cached_generate_profiles(3_000, cache=dataset_cache)
+    collection = IndexedProfileCollection(profiles)
+
+    assert len(collection) == len(profiles) and collection.violations == []
+    assert collection.get('ssn', profiles[100]['ssn']) == profiles[100]
+    assert profiles[100] in collection.find('username', profiles[100]['username'])
+    assert [profile['mail'] for profile in collection.find('mail', profiles[7]['mail'])] == \
+        [profile['mail'] for profile in profiles if profile['mail'] == profiles[7]['mail']]